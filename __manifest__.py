@@ -15,8 +15,11 @@
         'security/ir.model.access.csv',
         'security/is_chat_vllm_rules.xml',
         'security/is_search_general_rules.xml',
+        'data/ir_cron.xml',
         'views/is_chat_vllm_views.xml',
         'views/is_search_general_views.xml',
+        'views/is_search_general_timing_views.xml',
+        'views/is_search_general_catalog_views.xml',
         # 'views/ir_filters_views.xml',
         'views/res_company_views.xml',
         'views/menu.xml',
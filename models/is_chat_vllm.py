@@ -1,10 +1,24 @@
 # -*- coding: utf-8 -*-
 
 import base64
+import logging
+import re
 import time
 from odoo import api, fields, models
 from odoo.exceptions import UserError
 
+_logger = logging.getLogger(__name__)
+
+# Pages de PDF considérées comme textuelles à partir de ce nombre de caractères extraits
+PDF_TEXT_MIN_CHARS = 20
+
+# Questions portant sur l'aspect visuel des documents : les PDF sont alors envoyés en images
+VISUAL_KEYWORDS = re.compile(
+    r"\b(image|photo|logo|signature|sign[ée]e?|tampon|cachet|sch[ée]ma|dessin|couleur|"
+    r"mise en page|visuel|manuscrit|plan)s?\b",
+    re.IGNORECASE,
+)
+
 
 #tony@debian:~$ ssh -R 8000:10.1.5.57:8000 odoo@plastigray -N
 
@@ -39,6 +53,12 @@ class IsChatVllm(models.Model):
         readonly=True,
         copy=False,
     )
+    temps_attente = fields.Float(
+        string="Attente en file (s)",
+        readonly=True,
+        copy=False,
+        help="Temps passé à attendre un créneau libre avant l'envoi au serveur VLLM.",
+    )
     piece_jointe_ids = fields.Many2many(
         'ir.attachment',
         string='Pièces jointes',
@@ -52,32 +72,66 @@ class IsChatVllm(models.Model):
                 vals['name'] = self.env['ir.sequence'].next_by_code('is.chat.vllm') or 'Nouveau'
         return super().create(vals_list)
 
-    def _get_images_from_attachments(self):
-        """Extrait les images base64 depuis les pièces jointes.
+    def _use_pdf_text(self):
+        """Indique si les PDF doivent être envoyés par leur couche texte plutôt qu'en images."""
+        return (self.env.company.is_vllm_pdf_mode or 'text') == 'text' \
+            and not VISUAL_KEYWORDS.search(self.question or '')
 
-        Les images (JPEG, PNG, GIF, WEBP) sont envoyées directement.
-        Les PDF sont convertis en images page par page.
+    def _get_image_sources_from_attachments(self, pdf_texts=None):
+        """Retourne les sources d'images des pièces jointes, lues au moment de l'envoi.
 
-        :return: liste de tuples (base64_str, mime_type)
+        Rien n'est chargé ici : les images sont lues directement dans le filestore et
+        les PDF rendus page par page pendant l'écriture en flux du corps de la requête.
+
+        :param pdf_texts: Liste à compléter avec les (nom, page, texte) des pages de PDF
+                          envoyées en texte (voir _use_pdf_text) ; seules les pages sans
+                          texte sont alors rendues en images. Si None, tout est en images.
+        :return: liste de tuples (fonction produisant les octets, mime_type)
         """
         self.ensure_one()
         vllm = self.env['is.vllm']
-        images = []
+        sources = []
         image_mimes = ('image/jpeg', 'image/png', 'image/gif', 'image/webp')
+        use_text = pdf_texts is not None and self._use_pdf_text()
 
         for attachment in self.piece_jointe_ids:
             mimetype = attachment.mimetype or ''
+            if mimetype not in image_mimes and mimetype != 'application/pdf':
+                continue
+            path = attachment._full_path(attachment.store_fname) if attachment.store_fname else None
             if mimetype in image_mimes:
-                # Image : envoyer directement en base64
-                img_b64 = attachment.datas.decode('utf-8') if isinstance(attachment.datas, bytes) else attachment.datas
-                images.append((img_b64, mimetype))
-            elif mimetype == 'application/pdf':
-                # PDF : convertir chaque page en image PNG
-                pdf_data = base64.b64decode(attachment.datas)
-                pages_b64 = vllm._pdf_to_base64_images(pdf_data)
-                for page_b64 in pages_b64:
-                    images.append((page_b64, 'image/png'))
-        return images
+                if path:
+                    sources.append((lambda path=path: vllm._file_chunks(path), mimetype))
+                else:
+                    # Pièce jointe stockée en base : pas de fichier à lire en flux
+                    sources.append((lambda attachment=attachment: iter([attachment.raw]), mimetype))
+                continue
+
+            # PDF numérique : couche texte extraite localement, seules les pages sans
+            # texte (scans) sont rendues en images. Par défaut, toutes les pages.
+            image_pages = None
+            texts = vllm._pdf_page_texts(pdf_path=path, pdf_data=None if path else attachment.raw) if use_text else None
+            if texts is not None:
+                image_pages = []
+                for page, text in enumerate(texts, start=1):
+                    if len(text) >= PDF_TEXT_MIN_CHARS:
+                        pdf_texts.append((attachment.name, page, text))
+                    else:
+                        image_pages.append(page)
+                _logger.info("PDF %s : %s page(s) en texte, %s page(s) en image",
+                             attachment.name, len(texts) - len(image_pages), len(image_pages))
+
+            if path:
+                # Une source par page, rendue uniquement au moment de l'envoi
+                if image_pages is None:
+                    image_pages = range(1, vllm._pdf_page_count(path) + 1)
+                for page in image_pages:
+                    sources.append((lambda path=path, page=page: vllm._pdf_page_png_chunks(path, page), 'image/png'))
+            elif image_pages is None or image_pages:
+                for page, page_b64 in enumerate(vllm._pdf_to_base64_images(attachment.raw), start=1):
+                    if image_pages is None or page in image_pages:
+                        sources.append((lambda page_b64=page_b64: iter([base64.b64decode(page_b64)]), 'image/png'))
+        return sources
 
     def action_send_question(self):
         """Envoie la question au serveur VLLM et met à jour la réponse."""
@@ -87,16 +141,25 @@ class IsChatVllm(models.Model):
 
         vllm = self.env['is.vllm']
 
-        # Récupérer les images depuis les pièces jointes
-        images_b64 = self._get_images_from_attachments()
+        # Sources d'images des pièces jointes (lues et encodées pendant l'envoi) ; les
+        # PDF ayant une couche texte sont envoyés en texte dans le prompt
+        pdf_texts = []
+        image_sources = self._get_image_sources_from_attachments(pdf_texts=pdf_texts)
+        prompt = self.question
+        if pdf_texts:
+            prompt += ''.join(
+                "\n\n--- Pièce jointe %s, page %s ---\n%s" % (name, page, text)
+                for name, page, text in pdf_texts
+            )
 
         start = time.time()
-        result = vllm.vllm_send_prompt(self.question, images_b64=images_b64)
+        result = vllm.vllm_send_prompt(prompt, image_sources=image_sources or None, stage='chat')
         elapsed = time.time() - start
 
         if result['success']:
             self.response = result['response']
             self.temps_reponse = round(elapsed, 1)
+            self.temps_attente = round(result.get('queue_wait', 0.0), 2)
             # Poster la question et la réponse dans le chatter
             pj_info = ''
             if self.piece_jointe_ids:
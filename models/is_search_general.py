@@ -1,14 +1,136 @@
 # -*- coding: utf-8 -*-
 
+import base64
+import hashlib
+import json
 import logging
 import re
+import threading
 import time
-from odoo import api, fields, models
-from odoo.exceptions import UserError
+import zlib
+from array import array
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from odoo import api, fields, models, tools
+from odoo.exceptions import UserError, ValidationError
+from odoo.tools import split_every
 from odoo.tools.safe_eval import safe_eval, datetime
+from .is_vllm import PRIORITY_BATCH
+from .res_company import DOMAIN_CANDIDATES_MAX
+from .is_search_general_rules import (
+    parse_question,
+    DATE_FIELDS as RULES_DATE_FIELDS,
+    DEFAULT_DATE_FIELDS as RULES_DEFAULT_DATE_FIELDS,
+)
 
 _logger = logging.getLogger(__name__)
 
+# Nombre max de tokens générés pour les étapes à réponse courte
+STEP_MAX_TOKENS = {
+    'identification': 48,
+    'view_type':      4,
+    'group_by':       32,
+}
+VIEW_TYPES = ('tree', 'graph', 'pivot')
+GROUP_BY_DATE_INTERVALS = ('year', 'quarter', 'month', 'week', 'day')
+GROUP_BY_NONE = 'none'
+
+# Nombre max de domaines comptés dans une même requête SQL par la tâche planifiée
+COUNT_BATCH_SIZE = 50
+
+# Étapes mesurées lors d'une recherche (décomposition du temps de réponse)
+TIMING_STAGES = [
+    ('fast_path',      'Analyse locale'),
+    ('prefetch',       'Identification anticipée (attente)'),
+    ('catalog',        'Catalogue des modèles'),
+    ('identification', 'Identification du modèle (VLLM)'),
+    ('schema',         'Description du schéma'),
+    ('domain',         'Génération du domaine (VLLM)'),
+    ('validation',     'Validation du domaine'),
+    ('count',          'Comptage'),
+    ('preview',        'Aperçu des résultats'),
+    ('snapshot',       'Instantané'),
+    ('repair',         'Correction du domaine (VLLM)'),
+    ('view_type',      'Type de vue (VLLM)'),
+    ('group_by',       'Regroupement (VLLM)'),
+    ('aggregate',      'Synthèse'),
+    ('queue',          "Attente en file d'admission"),
+]
+
+# Description compacte du schéma : champs techniques des mixins exclus du prompt
+SCHEMA_EXCLUDED_PREFIXES = ('message_', 'activity_', 'website_message_', 'access_')
+SCHEMA_EXCLUDED_FIELDS = ('has_message', 'my_activity_date_deadline', 'website_url')
+SCHEMA_MAX_SELECTION_VALUES = 20
+# Ordre d'affichage des types dans la description compacte
+SCHEMA_TYPE_ORDER = (
+    'char', 'text', 'html', 'selection', 'boolean', 'integer', 'float', 'monetary',
+    'date', 'datetime', 'many2one', 'one2many', 'many2many',
+)
+
+# Identification anticipée du modèle pendant la saisie de la question
+PREFETCH_MIN_LENGTH = 8
+PREFETCH_POLL_INTERVAL = 0.2
+PREFETCH_TTL_HOURS = 1
+PREFETCH_MAX_THREADS = 4
+
+# Threads d'identification anticipée du worker : nombre limité, un seul par utilisateur
+_prefetch_slots = threading.BoundedSemaphore(PREFETCH_MAX_THREADS)
+_prefetch_users = set()
+_prefetch_lock = threading.Lock()
+
+# Aperçu des premiers résultats : champs affichés (par ordre de préférence) en plus du nom
+PREVIEW_KEY_FIELDS = (
+    'partner_id', 'invoice_date', 'date_order', 'date', 'amount_total', 'state', 'user_id',
+)
+PREVIEW_MAX_FIELDS = 3
+# Comptage des enregistrements visibles par l'utilisateur, borné
+PREVIEW_COUNT_LIMIT = 10000
+
+# Synthèse pré-calculée des vues graph / pivot
+AGGREGATE_MAX_MEASURES = 3
+AGGREGATE_MAX_ROWS = 200
+
+
+@contextmanager
+def _timed(timings, stage):
+    """Ajoute la durée du bloc à timings[stage] (si timings n'est pas None)."""
+    start = time.time()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + time.time() - start
+
+
+def _pack_ids(ids):
+    """Compacte une liste d'ids : tri, écarts successifs en entiers 32 bits, puis zlib."""
+    deltas = array('I')
+    previous = 0
+    for record_id in sorted(ids):
+        deltas.append(record_id - previous)
+        previous = record_id
+    return zlib.compress(deltas.tobytes())
+
+
+def _unpack_ids(data):
+    """Opération inverse de _pack_ids."""
+    deltas = array('I')
+    deltas.frombytes(zlib.decompress(data))
+    ids = []
+    current = 0
+    for delta in deltas:
+        current += delta
+        ids.append(current)
+    return ids
+
+
+def _release_prefetch_slot(uid):
+    """Libère le créneau de thread d'identification anticipée d'un utilisateur."""
+    with _prefetch_lock:
+        _prefetch_users.discard(uid)
+    _prefetch_slots.release()
+
 
 class IsSearchGeneral(models.Model):
     _name = 'is.search.general'
@@ -59,16 +181,82 @@ class IsSearchGeneral(models.Model):
         readonly=True,
         copy=False,
     )
+    domain_alternatives = fields.Text(
+        string='Domaines alternatifs',
+        readonly=True,
+        copy=False,
+        help="Autres domaines candidats proposés par VLLM avec leur nombre de résultats.",
+    )
+    domain_repairs = fields.Integer(
+        string='Corrections du domaine',
+        readonly=True,
+        copy=False,
+        help="Nombre d'allers-retours avec VLLM pour corriger un domaine refusé "
+             "(erreur de syntaxe ou de l'ORM renvoyée à VLLM).",
+    )
     temps_reponse = fields.Float(
         string='Temps de réponse (s)',
         readonly=True,
         copy=False,
     )
+    fast_path = fields.Boolean(
+        string='Traitée localement',
+        readonly=True,
+        copy=False,
+        help="Recherche simple (type de document, période, état) dont le domaine a été "
+             "construit localement, sans appel à VLLM.",
+    )
+    temps_attente = fields.Float(
+        string='Attente en file (s)',
+        readonly=True,
+        copy=False,
+        help="Temps total passé à attendre un créneau libre avant les envois au serveur VLLM.",
+    )
+    timing_ids = fields.One2many(
+        'is.search.general.timing',
+        'search_id',
+        string='Temps par étape',
+        readonly=True,
+        copy=False,
+    )
     nb_results = fields.Integer(
         string="Nombre d'enregistrements",
         readonly=True,
         copy=False,
     )
+    nb_results_date = fields.Datetime(
+        string='Date du comptage',
+        readonly=True,
+        copy=False,
+    )
+    nb_results_watermark = fields.Char(
+        string='Marque de modification du modèle',
+        readonly=True,
+        copy=False,
+        help="État des modifications de la table du modèle lors du dernier comptage. "
+             "Le comptage n'est pas rafraîchi tant qu'il ne change pas.",
+    )
+    snapshot_enabled = fields.Boolean(
+        string='Instantané des résultats',
+        help="Mémorise les ids des enregistrements trouvés pour ré-ouvrir les résultats "
+             "instantanément, sans ré-évaluer le domaine. Utile pour les recherches coûteuses. "
+             "Le bouton 'Rafraîchir l'instantané' met à jour la liste.",
+    )
+    snapshot_data = fields.Binary(
+        string='Ids de l\'instantané',
+        attachment=False,
+        readonly=True,
+        copy=False,
+    )
+    snapshot_date = fields.Datetime(
+        string='Date de l\'instantané',
+        readonly=True,
+        copy=False,
+    )
+    snapshot_age = fields.Char(
+        string='Âge de l\'instantané',
+        compute='_compute_snapshot_age',
+    )
     view_type = fields.Selection(
         [
             ('tree', 'Liste'),
@@ -95,6 +283,29 @@ class IsSearchGeneral(models.Model):
         readonly=True,
         copy=False,
     )
+    aggregate_data = fields.Text(
+        string='Synthèse (données)',
+        readonly=True,
+        copy=False,
+        help="Résultat du read_group calculé lors de la recherche (JSON).",
+    )
+    aggregate_date = fields.Datetime(
+        string='Date de la synthèse',
+        readonly=True,
+        copy=False,
+    )
+    aggregate_html = fields.Html(
+        string='Synthèse',
+        compute='_compute_aggregate_html',
+        sanitize=False,
+    )
+    preview_html = fields.Html(
+        string='Aperçu',
+        readonly=True,
+        copy=False,
+        sanitize=False,
+        help="Premiers enregistrements trouvés, pour vérifier le domaine sans ouvrir la liste.",
+    )
     filter_id = fields.Many2one(
         'ir.filters',
         string='Favori associé',
@@ -110,18 +321,216 @@ class IsSearchGeneral(models.Model):
                 vals['name'] = self.env['ir.sequence'].next_by_code('is.search.general') or 'Nouveau'
         return super().create(vals_list)
 
-    def _get_installed_models_list(self):
-        """Retourne la liste des modèles installés avec leur description."""
-        models = self.env['ir.model'].sudo().search([
+    def write(self, vals):
+        # Un instantané ne correspond plus au domaine dès que celui-ci change
+        if 'domain' in vals and 'snapshot_data' not in vals:
+            vals = dict(vals, snapshot_data=False, snapshot_date=False)
+        # Idem pour la synthèse, qui dépend aussi du regroupement
+        if ('domain' in vals or 'group_by' in vals) and 'aggregate_data' not in vals:
+            vals = dict(vals, aggregate_data=False, aggregate_date=False)
+        # Et pour l'aperçu des premiers résultats
+        if 'domain' in vals and 'preview_html' not in vals:
+            vals = dict(vals, preview_html=False)
+        return super().write(vals)
+
+    @api.depends('aggregate_data')
+    def _compute_aggregate_html(self):
+        for rec in self:
+            data = json.loads(rec.aggregate_data) if rec.aggregate_data else None
+            if not data:
+                rec.aggregate_html = False
+                continue
+            head = ''.join('<th class="text-end">%s</th>' % tools.html_escape(label)
+                           for label in ['Nombre'] + data['measures'])
+            body = ''.join(
+                '<tr><td>%s</td>%s</tr>' % (
+                    tools.html_escape(row[0]),
+                    ''.join('<td class="text-end">%s</td>' % (tools.formatLang(rec.env, value) if index else value)
+                            for index, value in enumerate(row[1:])),
+                )
+                for row in data['rows']
+            )
+            rec.aggregate_html = (
+                '<table class="table table-sm table-striped">'
+                '<thead><tr><th>%s</th>%s</tr></thead><tbody>%s</tbody></table>'
+            ) % (tools.html_escape(data['group_by_label']), head, body)
+
+    @api.depends('snapshot_date')
+    def _compute_snapshot_age(self):
+        now = fields.Datetime.now()
+        for rec in self:
+            if not rec.snapshot_date:
+                rec.snapshot_age = False
+                continue
+            minutes = int((now - rec.snapshot_date).total_seconds() // 60)
+            if minutes < 60:
+                rec.snapshot_age = "%s min" % minutes
+            elif minutes < 24 * 60:
+                rec.snapshot_age = "%s h" % (minutes // 60)
+            else:
+                rec.snapshot_age = "%s j" % (minutes // (24 * 60))
+
+    def _get_installed_models(self):
+        """Retourne les modèles installés proposés à VLLM (catalogue).
+
+        Les modèles abstraits (mail.thread, report.*...) n'ont pas de table et ne
+        peuvent pas être recherchés : ils sont écartés.
+        """
+        return self.env['ir.model'].sudo().search([
             ('transient', '=', False),
-        ], order='model')
+        ], order='model').filtered(lambda m: m.model in self.env and not self.env[m.model]._abstract)
+
+    @tools.ormcache('min_rows', 'lang')
+    def _get_catalog_entries(self, min_rows, lang):
+        """Catalogue élagué d'après les statistiques (is.search.general.catalog).
+
+        Retourne un tuple de (modèle, description) : modèles non vides ou forcés,
+        les plus souvent recherchés avec succès en premier. Le résultat ne change
+        qu'à l'actualisation des statistiques et est mis en cache ; il est vide si
+        les statistiques n'ont jamais été calculées.
+        """
+        entries = self.env['is.search.general.catalog'].sudo().with_context(lang=lang).search([
+            ('inclusion', '!=', 'never'),
+            '|', '|',
+            ('inclusion', '=', 'always'),
+            ('row_estimate', '<', 0),
+            ('row_estimate', '>=', min_rows),
+        ])
+        return tuple((e.model, e.model_id.name) for e in entries)
+
+    def _get_catalog(self, readable_only=True):
+        """Modèles proposés à VLLM : liste de (modèle, description).
+
+        Catalogue élagué si l'option est active et les statistiques calculées, sinon
+        tous les modèles installés.
+
+        :param readable_only: limiter aux modèles que l'utilisateur peut lire (droits
+                              d'accès en cache, sans requête). Le prompt d'identification
+                              utilise le catalogue complet, identique pour tous les
+                              utilisateurs afin de rester dans le cache de préfixes de
+                              VLLM ; le modèle identifié est contrôlé ensuite.
+        """
+        company = self.env.company
+        entries = ()
+        if company.is_vllm_catalog_pruning:
+            entries = self._get_catalog_entries(max(company.is_vllm_catalog_min_rows, 0), self.env.lang)
+        if not entries:
+            entries = [(m.model, m.name) for m in self._get_installed_models()]
+        return [
+            (model, name) for model, name in entries
+            if model in self.env and (
+                not readable_only or self.env[model].check_access_rights('read', raise_exception=False)
+            )
+        ]
+
+    def _get_installed_models_list(self):
+        """Retourne la liste des modèles du catalogue avec leur description."""
         lines = []
-        for m in models:
-            lines.append('%s (%s)' % (m.model, m.name))
+        for model, name in self._get_catalog(readable_only=False):
+            lines.append('%s (%s)' % (model, name))
         return '\n'.join(lines)
 
-    def _get_model_fields_description(self, model_name):
-        """Retourne une description des champs du modèle pour aider VLLM."""
+    def _get_schema_legend(self):
+        """Légende du format de description des champs, insérée dans les prompts."""
+        if (self.env.company.is_vllm_schema_format or 'compact') != 'compact':
+            return ''
+        return (" (une ligne par type : 'type: champ:Libellé, ...' ; "
+                "'many2one>modèle' = champs relationnels vers ce modèle ; [valeurs] = valeurs de sélection)")
+
+    @tools.ormcache('model_name')
+    def _get_group_by_choices(self, model_name):
+        """Retourne les valeurs de group_by autorisées (décodage contraint et validation).
+
+        Champs stockés regroupables du modèle, avec les granularités pour les dates,
+        plus 'none' si aucun regroupement n'est pertinent. Le résultat ne dépend que du
+        schéma du modèle et est mis en cache.
+        """
+        try:
+            model_obj = self.env[model_name]
+        except KeyError:
+            return ()
+        choices = []
+        for fname, fobj in model_obj._fields.items():
+            if fname.startswith('_') or not fobj.store:
+                continue
+            if fobj.type in ('one2many', 'many2many', 'binary', 'html', 'text'):
+                continue
+            if fobj.type in ('date', 'datetime'):
+                choices.extend('%s:%s' % (fname, interval) for interval in GROUP_BY_DATE_INTERVALS)
+            else:
+                choices.append(fname)
+        choices.append(GROUP_BY_NONE)
+        return tuple(choices)
+
+    def _is_valid_group_by(self, model_name, group_by):
+        """Vérifie un group_by (champ[:granularité]) par rapport au schéma du modèle."""
+        return bool(group_by) and group_by != GROUP_BY_NONE and group_by in self._get_group_by_choices(model_name)
+
+    @api.constrains('group_by', 'model_id')
+    def _check_group_by(self):
+        for rec in self:
+            if rec.group_by and rec.model_name and not rec._is_valid_group_by(rec.model_name, rec.group_by):
+                raise ValidationError(
+                    "Le regroupement '%s' n'est pas valide pour le modèle %s.\n"
+                    "Utilisez un champ stocké du modèle, avec une granularité pour les dates "
+                    "(ex: create_date:month)." % (rec.group_by, rec.model_name)
+                )
+
+    def _get_model_fields_description(self, model_name, schema_format=None):
+        """Retourne une description des champs du modèle pour aider VLLM.
+
+        :param schema_format: 'compact' ou 'verbose' (défaut : paramètre société)
+        """
+        schema_format = schema_format or self.env.company.is_vllm_schema_format or 'compact'
+        if schema_format == 'compact':
+            return self._get_model_fields_description_compact(model_name)
+        return self._get_model_fields_description_verbose(model_name)
+
+    @tools.ormcache('model_name')
+    def _get_model_fields_description_compact(self, model_name):
+        """Description compacte des champs, regroupés par type.
+
+        Une ligne par type (et par modèle lié pour les relations, qui n'est donc écrit
+        qu'une fois), libellé omis s'il n'apporte rien, champs techniques des mixins
+        (messagerie, activités, portail) exclus. Le résultat ne dépend que du schéma
+        et est mis en cache.
+        """
+        try:
+            model_obj = self.env[model_name]
+        except KeyError:
+            return ""
+        groups = {}
+        for fname, fobj in model_obj._fields.items():
+            if fname.startswith('_') or not fobj.store:
+                continue
+            if fname.startswith(SCHEMA_EXCLUDED_PREFIXES) or fname in SCHEMA_EXCLUDED_FIELDS:
+                continue
+            flabel = fobj.string or fname
+            item = fname if flabel.lower().replace(' ', '_') == fname else '%s:%s' % (fname, flabel)
+            if fobj.type == 'selection':
+                try:
+                    sel = fobj.selection
+                    if isinstance(sel, str):
+                        sel = getattr(model_obj, sel)()
+                    elif callable(sel):
+                        sel = sel(model_obj)
+                    item += '[%s]' % '|'.join(str(s[0]) for s in sel[:SCHEMA_MAX_SELECTION_VALUES])
+                except Exception:
+                    pass
+            key = fobj.type
+            if fobj.type in ('many2one', 'one2many', 'many2many'):
+                key = '%s>%s' % (fobj.type, fobj.comodel_name or '')
+            groups.setdefault(key, []).append(item)
+
+        def sort_key(key):
+            ftype = key.split('>')[0]
+            rank = SCHEMA_TYPE_ORDER.index(ftype) if ftype in SCHEMA_TYPE_ORDER else len(SCHEMA_TYPE_ORDER)
+            return rank, key
+
+        return '\n'.join('%s: %s' % (key, ', '.join(groups[key])) for key in sorted(groups, key=sort_key))
+
+    def _get_model_fields_description_verbose(self, model_name):
+        """Description détaillée des champs : une ligne par champ."""
         try:
             model_obj = self.env[model_name]
         except KeyError:
@@ -182,9 +591,13 @@ class IsSearchGeneral(models.Model):
                             'error': "Chaque condition doit avoir 3 éléments. Trouvé : %s" % str(item)}
         return {'valid': True, 'domain': domain_str, 'error': ''}
 
-    def _ask_vllm_for_model(self):
-        """Demande à VLLM d'identifier le modèle Odoo correspondant à la question."""
-        self.ensure_one()
+    def _get_model_prompts(self):
+        """Retourne (system_prompt, prompt) pour l'identification du modèle.
+
+        Le catalogue des modèles est placé avant la question pour que le préfixe
+        (system prompt + catalogue) soit identique d'une recherche à l'autre et
+        reste dans le cache de préfixes du serveur VLLM.
+        """
         models_list = self._get_installed_models_list()
         system_prompt = (
             "Tu es un expert Odoo 16. On te donne une demande utilisateur et la liste des modèles Odoo installés. "
@@ -192,18 +605,104 @@ class IsSearchGeneral(models.Model):
             "Réponds UNIQUEMENT avec le nom technique du modèle (ex: account.move), sans aucune explication."
         )
         prompt = (
-            "Demande de l'utilisateur :\n%s\n\n"
             "Liste des modèles Odoo installés :\n%s\n\n"
+            "Demande de l'utilisateur :\n%s\n\n"
             "Quel est le modèle Odoo le plus pertinent ?"
-        ) % (self.question, models_list)
+        ) % (models_list, self.question or '')
+        return system_prompt, prompt
 
-        vllm = self.env['is.vllm']
-        result = vllm.vllm_send_prompt(prompt, system_prompt=system_prompt)
-        return result
+    def _get_model_spec(self):
+        """Paramètres de vllm_send_prompt pour l'identification du modèle."""
+        system_prompt, prompt = self._get_model_prompts()
+        return {
+            'prompt':        prompt,
+            'system_prompt': system_prompt,
+            'max_tokens':    STEP_MAX_TOKENS['identification'],
+            'stage':         'identification',
+            'guided_choice': [model for model, _name in self._get_catalog(readable_only=False)],
+        }
+
+    @api.onchange('question')
+    def _onchange_question_prefetch(self):
+        """Lance l'identification du modèle en arrière-plan dès que la question est saisie.
+
+        Le client web déclenche l'onchange quand la saisie s'arrête (sortie du champ),
+        action_search retrouve ensuite le résultat (voir _get_prefetched_model).
+        """
+        question = ' '.join((self.question or '').split())
+        if self.model_id or len(question) < PREFETCH_MIN_LENGTH:
+            return
+        if not self.env.company.is_vllm_prefetch or getattr(threading.current_thread(), 'testing', False):
+            return
+        key = self._get_prefetch_key(question)
+        self.env.cr.execute("""
+            SELECT 1 FROM is_search_general_prefetch
+             WHERE key = %s AND create_uid = %s AND state IN ('pending', 'done')
+               AND create_date > now() at time zone 'UTC' - interval '1 hour' * %s
+             LIMIT 1
+        """, (key, self.env.uid, PREFETCH_TTL_HOURS))
+        if self.env.cr.fetchone():
+            return
+        # Travail spéculatif : ignoré si l'utilisateur a déjà une identification en cours
+        # dans ce worker ou si le nombre maximum de threads est atteint
+        uid = self.env.uid
+        with _prefetch_lock:
+            if uid in _prefetch_users or not _prefetch_slots.acquire(blocking=False):
+                return
+            _prefetch_users.add(uid)
+        try:
+            threading.Thread(
+                target=self.env['is.search.general.prefetch']._run_prefetch,
+                args=(self.pool, uid, dict(self.env.context), key, question),
+                name='vllm_prefetch',
+                daemon=True,
+            ).start()
+        except Exception:
+            _release_prefetch_slot(uid)
+            raise
 
-    def _ask_vllm_for_domain(self, model_name):
-        """Demande à VLLM de générer un domaine Odoo pour le modèle identifié."""
+    def _get_prefetch_key(self, question):
+        """Clé d'une identification anticipée : société, langue et question."""
+        data = '%s|%s|%s' % (self.env.company.id, self.env.lang, ' '.join((question or '').split()))
+        return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+    def _get_prefetched_model(self):
+        """Résultat de l'identification anticipée du modèle pour la question, s'il existe.
+
+        Si l'identification est encore en cours, elle est attendue au plus le délai
+        défini sur la société. La lecture se fait sur un curseur dédié pour voir les
+        résultats validés par le thread après le début de la transaction courante.
+
+        :return: dict au format de vllm_send_prompt, ou None si l'identification est à faire
+        """
         self.ensure_one()
+        company = self.env.company
+        if not company.is_vllm_prefetch or self.model_id:
+            return None
+        key = self._get_prefetch_key(self.question)
+        deadline = time.time() + max(company.is_vllm_prefetch_wait, 0)
+        with self.pool.cursor() as cr:
+            while True:
+                cr.execute("""
+                    SELECT state, response FROM is_search_general_prefetch
+                     WHERE key = %s AND create_uid = %s AND state IN ('pending', 'done')
+                       AND create_date > now() at time zone 'UTC' - interval '1 hour' * %s
+                     ORDER BY id DESC LIMIT 1
+                """, (key, self.env.uid, PREFETCH_TTL_HOURS))
+                row = cr.fetchone()
+                if not row:
+                    return None
+                state, response = row
+                if state == 'done':
+                    return {'success': True, 'response': response, 'error': None, 'queue_wait': 0.0}
+                if time.time() >= deadline:
+                    return None
+                # Fin de la transaction pour voir le résultat dès qu'il est validé
+                cr.rollback()
+                time.sleep(PREFETCH_POLL_INTERVAL)
+
+    def _get_domain_prompts(self, model_name):
+        """Retourne (system_prompt, prompt) pour la génération du domaine."""
         fields_desc = self._get_model_fields_description(model_name)
         system_prompt = (
             "Tu es un expert Odoo 16. Tu dois générer un domaine Odoo (domain) valide "
@@ -251,18 +750,37 @@ class IsSearchGeneral(models.Model):
 
         prompt = (
             "Modèle Odoo : %s\n\n"
-            "Champs disponibles dans ce modèle :\n%s\n\n"
+            "Champs disponibles dans ce modèle%s :\n%s\n\n"
             "Demande de l'utilisateur :\n%s\n\n"
             "Génère le domaine Odoo correspondant à cette demande."
-        ) % (model_name, fields_desc, self.question)
+        ) % (model_name, self._get_schema_legend(), fields_desc, self.question or '')
+        return system_prompt, prompt
+
+    def _get_domain_spec(self, model_name, n=None):
+        """Paramètres de vllm_send_prompt pour la génération du domaine.
+
+        :param n: Nombre de domaines candidats à générer en une seule requête
+        """
+        system_prompt, prompt = self._get_domain_prompts(model_name)
+        return {
+            'prompt':        prompt,
+            'system_prompt': system_prompt,
+            'n':             n,
+            'stage':         'domain',
+        }
 
+    def _ask_vllm_for_domain(self, model_name, n=None):
+        """Demande à VLLM de générer un domaine Odoo pour le modèle identifié.
+
+        :param n: Nombre de domaines candidats à générer en une seule requête
+        """
+        self.ensure_one()
         vllm = self.env['is.vllm']
-        result = vllm.vllm_send_prompt(prompt, system_prompt=system_prompt)
+        result = vllm.vllm_send_prompt(**self._get_domain_spec(model_name, n=n))
         return result
 
-    def _ask_vllm_for_view_type(self):
-        """Demande à VLLM d'identifier le type de vue le plus approprié pour la question."""
-        self.ensure_one()
+    def _get_view_type_prompts(self):
+        """Retourne (system_prompt, prompt) pour le choix du type de vue."""
         system_prompt = (
             "Tu es un expert Odoo 16. On te donne une demande utilisateur et tu dois déterminer "
             "le type de vue le plus approprié pour afficher les résultats. "
@@ -275,15 +793,22 @@ class IsSearchGeneral(models.Model):
         prompt = (
             "Demande de l'utilisateur :\n%s\n\n"
             "Quel type de vue est le plus approprié pour afficher ces résultats ?"
-        ) % self.question
+        ) % (self.question or '')
+        return system_prompt, prompt
 
-        vllm = self.env['is.vllm']
-        result = vllm.vllm_send_prompt(prompt, system_prompt=system_prompt)
-        return result
+    def _get_view_type_spec(self):
+        """Paramètres de vllm_send_prompt pour le choix du type de vue."""
+        system_prompt, prompt = self._get_view_type_prompts()
+        return {
+            'prompt':        prompt,
+            'system_prompt': system_prompt,
+            'max_tokens':    STEP_MAX_TOKENS['view_type'],
+            'stage':         'view_type',
+            'guided_choice': VIEW_TYPES,
+        }
 
-    def _ask_vllm_for_group_by(self, model_name):
-        """Demande à VLLM de déterminer le regroupement approprié pour les vues graph/pivot."""
-        self.ensure_one()
+    def _get_group_by_prompts(self, model_name):
+        """Retourne (system_prompt, prompt) pour le choix du regroupement."""
         fields_desc = self._get_model_fields_description(model_name)
         system_prompt = (
             "Tu es un expert Odoo 16. On te donne une demande utilisateur pour un graphique ou tableau croisé. "
@@ -301,107 +826,410 @@ class IsSearchGeneral(models.Model):
         )
         prompt = (
             "Modèle Odoo : %s\n\n"
-            "Champs disponibles dans ce modèle :\n%s\n\n"
+            "Champs disponibles dans ce modèle%s :\n%s\n\n"
             "Demande de l'utilisateur :\n%s\n\n"
             "Quel champ utiliser pour le regroupement (group_by) ?"
-        ) % (model_name, fields_desc, self.question)
+        ) % (model_name, self._get_schema_legend(), fields_desc, self.question or '')
+        return system_prompt, prompt
 
+    def _get_group_by_spec(self, model_name):
+        """Paramètres de vllm_send_prompt pour le choix du regroupement."""
+        system_prompt, prompt = self._get_group_by_prompts(model_name)
+        return {
+            'prompt':        prompt,
+            'system_prompt': system_prompt,
+            'max_tokens':    STEP_MAX_TOKENS['group_by'],
+            'stage':         'group_by',
+            'guided_choice': self._get_group_by_choices(model_name),
+        }
+
+    def _ask_vllm_for_group_by(self, model_name):
+        """Demande à VLLM de déterminer le regroupement approprié pour les vues graph/pivot."""
+        self.ensure_one()
         vllm = self.env['is.vllm']
-        result = vllm.vllm_send_prompt(prompt, system_prompt=system_prompt)
+        result = vllm.vllm_send_prompt(**self._get_group_by_spec(model_name))
         return result
 
-    def action_search(self):
-        """Lance la recherche : identifie le modèle puis génère le domaine."""
+    def _set_group_by_from_response(self, model_name, response):
+        """Enregistre le group_by proposé par VLLM s'il est valide pour le modèle."""
+        response = response.strip()
+        self.vllm_group_by_response = response
+        # Nettoyer la réponse
+        group_by = response.split('\n')[0].strip().strip('`').strip().lower()
+        if self._is_valid_group_by(model_name, group_by):
+            self.group_by = group_by
+        elif group_by and group_by != GROUP_BY_NONE:
+            _logger.warning("Recherche générale [%s] : group_by '%s' invalide pour %s, ignoré",
+                            self.name, group_by, model_name)
+
+    def _try_fast_path(self):
+        """Traite localement une recherche simple (voir is_search_general_rules).
+
+        Le domaine est construit sans VLLM si toute la question est reconnue et que
+        les champs utilisés existent dans le modèle ; il est validé par un comptage.
+
+        :return: (modèle, nombre de résultats), ou None pour passer par VLLM
+        """
         self.ensure_one()
-        if not self.question:
-            raise UserError("Veuillez saisir une recherche.")
+        parsed = parse_question(self.question)
+        if not parsed:
+            return None
+        model_name = self.model_id.model if self.model_id else parsed['model']
+        if not model_name or parsed['model'] not in (None, model_name):
+            return None
+        if model_name not in dict(self._get_catalog()):
+            return None
+        model = self.env[model_name]
 
-        start = time.time()
-        model_name = None
+        terms = []
+        for fname, operator, value in parsed['base']:
+            if fname not in model._fields:
+                return None
+            terms.append((fname, operator, value))
+        for fname, values in parsed['states']:
+            field = model._fields.get(fname)
+            if not field or field.type != 'selection':
+                return None
+            allowed = [v for v in values if v in field.get_values(self.env)]
+            if not allowed:
+                return None
+            terms.append((fname, '=', allowed[0]) if len(allowed) == 1 else (fname, 'in', tuple(allowed)))
+        terms = [repr(term) for term in terms]
+        if parsed['period']:
+            date_field = RULES_DATE_FIELDS.get(model_name)
+            if date_field not in model._fields:
+                date_field = next((f for f in RULES_DEFAULT_DATE_FIELDS if f in model._fields), None)
+            if not date_field:
+                return None
+            date_start, date_end = parsed['period']
+            terms.append("(%r, '>=', %s)" % (date_field, date_start))
+            if date_end:
+                terms.append("(%r, '<', %s)" % (date_field, date_end))
+        domain_str = '[%s]' % ', '.join(terms)
 
-        # Étape 1 : Identifier le modèle
-        if self.model_id:
-            model_name = self.model_id.model
-            self.vllm_model_response = "Modèle sélectionné manuellement : %s" % model_name
-        else:
-            result = self._ask_vllm_for_model()
-            if not result['success']:
-                raise UserError("Erreur VLLM (identification modèle) : %s" % result['error'])
+        try:
+            domain = safe_eval(domain_str, {
+                'datetime': datetime,
+                'context_today': datetime.datetime.now,
+            })
+            count = model.sudo().search_count(domain)
+        except Exception as e:
+            _logger.warning("Recherche générale : domaine local rejeté %s (%s)", domain_str, e)
+            return None
 
-            response = result['response'].strip()
-            self.vllm_model_response = response
+        self.write({
+            'model_id':             self.env['ir.model']._get_id(model_name),
+            'domain':               domain_str,
+            'domain_alternatives':  False,
+            'fast_path':            True,
+            'domain_repairs':       0,
+            'vllm_model_response':  "Recherche traitée localement, sans VLLM",
+            'vllm_domain_response': False,
+            'view_type':            self.view_type or 'tree',
+        })
+        return model_name, count
 
-            # Nettoyer la réponse (enlever les éventuels retours à la ligne, espaces, etc.)
-            candidate = response.split('\n')[0].strip().strip('`').strip()
+    def _save_timings(self, timings):
+        """Enregistre la décomposition du temps de réponse par étape (remplace la précédente).
 
-            # Vérifier que le modèle existe
-            model_rec = self.env['ir.model'].sudo().search([('model', '=', candidate)], limit=1)
-            if not model_rec:
-                raise UserError(
-                    "VLLM a proposé le modèle '%s' mais il n'existe pas dans Odoo.\n\n"
-                    "Réponse VLLM :\n%s\n\n"
-                    "Vous pouvez sélectionner le modèle manuellement." % (candidate, response)
-                )
-            self.model_id = model_rec.id
-            model_name = candidate
+        :param timings: dict {étape: durée en secondes}, étapes de TIMING_STAGES
+        """
+        self.ensure_one()
+        timings = dict(timings, queue=self.temps_attente)
+        self.timing_ids = [(5, 0, 0)] + [
+            (0, 0, {'stage': stage, 'duration': round(timings[stage], 3)})
+            for stage, _label in TIMING_STAGES if timings.get(stage)
+        ]
 
-        # Étape 2 : Générer le domaine
-        result = self._ask_vllm_for_domain(model_name)
+    def _track_queue_wait(self, result, timings=None, stage=None):
+        """Cumule le temps d'attente en file d'admission d'un appel VLLM.
+
+        L'attente est retirée de la durée de l'étape de l'appel (timings[stage]) : elle
+        est enregistrée à part (étape 'queue') et ne doit pas être comptée deux fois.
+        """
+        queue_wait = result.get('queue_wait') or 0.0
+        self.temps_attente = round(self.temps_attente + queue_wait, 2)
+        if timings is not None and stage in timings:
+            timings[stage] = max(timings[stage] - queue_wait, 0.0)
+
+    def _generate_domain(self, model_name, result=None, timings=None):
+        """Génère le domaine via VLLM, l'enregistre et retourne le nombre de résultats.
+
+        Si plusieurs candidats sont demandés (paramètre n de la fiche société), ils sont
+        tous validés et comptés en parallèle : le premier valide et non vide est retenu,
+        les autres sont affichés dans les domaines alternatifs.
+
+        :param result: Réponse VLLM déjà obtenue (ex: appel groupé), sinon VLLM est interrogé
+        :param timings: dict des durées par étape à compléter (voir _save_timings)
+        """
+        self.ensure_one()
+        if result is None:
+            with _timed(timings, 'schema'):
+                spec = self._get_domain_spec(model_name, n=self._get_domain_candidates())
+            with _timed(timings, 'domain'):
+                result = self.env['is.vllm'].vllm_send_prompt(**spec)
+        self._track_queue_wait(result, timings, 'domain')
         if not result['success']:
             raise UserError("Erreur VLLM (génération domaine) : %s" % result['error'])
 
-        response = result['response']
-        self.vllm_domain_response = response
+        responses = result.get('responses') or [result['response']]
+        self.vllm_domain_response = '\n\n-----\n\n'.join(responses)
 
-        domain_str = self._extract_text_from_response(response, marker='[')
-        if not domain_str:
+        candidates = self._evaluate_domain_candidates(model_name, responses, timings=timings)
+        self.domain_repairs = 0
+        if not any(c['valid'] for c in candidates):
+            candidates = self._repair_domain(model_name, candidates, timings=timings)
+        valid = [c for c in candidates if c['valid']]
+        if not valid:
+            first = candidates[0]
+            if not first['domain']:
+                raise UserError(
+                    "VLLM n'a pas retourné de domaine valide.\n\n"
+                    "Réponse reçue :\n%s" % first['response']
+                )
             raise UserError(
-                "VLLM n'a pas retourné de domaine valide.\n\n"
-                "Réponse reçue :\n%s" % response
+                "Le domaine proposé par VLLM n'est pas valide :\n%s\n\n"
+                "Domaine proposé :\n%s" % (first['error'], first['domain'])
             )
 
-        validation = self._validate_domain(domain_str)
-        if not validation['valid']:
-            raise UserError(
-                "Le domaine proposé par VLLM n'est pas valide :\n%s\n\n"
-                "Domaine proposé :\n%s" % (validation['error'], domain_str)
+        # Premier candidat valide et non vide, sinon le premier valide
+        selected = next((c for c in valid if c['count']), valid[0])
+        self.domain = selected['domain']
+        self.domain_alternatives = '\n'.join(
+            "%s %s : %s" % (
+                '✔' if c['valid'] else '✘',
+                c['count'] if c['valid'] else c['error'],
+                c['domain'] or c['response'],
             )
+            for c in candidates if c is not selected
+        ) or False
+        return selected['count']
 
-        self.domain = validation['domain']
-        elapsed = time.time() - start
-        self.temps_reponse = round(elapsed, 1)
+    def _get_domain_candidates(self):
+        """Nombre de domaines candidats à demander (paramètre n)."""
+        return min(max(self.env.company.is_vllm_domain_candidates, 1), DOMAIN_CANDIDATES_MAX)
 
-        # Compter les enregistrements
-        count = self._count_results(model_name, self.domain)
-        self.nb_results = count
+    def _evaluate_domain_candidates(self, model_name, responses, timings=None):
+        """Extrait, valide et compte chaque domaine candidat.
+
+        :return: liste de dicts (response, domain, valid, error, count) dans l'ordre des réponses
+        """
+        candidates = []
+        with _timed(timings, 'validation'):
+            for response in responses:
+                domain_str = self._extract_text_from_response(response, marker='[')
+                candidate = {'response': response, 'domain': domain_str, 'valid': False, 'error': '', 'count': 0}
+                if domain_str:
+                    validation = self._validate_domain(domain_str)
+                    candidate.update(valid=validation['valid'], error=validation['error'])
+                else:
+                    candidate['error'] = "Aucun domaine dans la réponse."
+                candidates.append(candidate)
+
+        # Les candidats identiques (aux espaces près) ne sont comptés qu'une fois
+        valid = [c for c in candidates if c['valid']]
+        unique = list(dict.fromkeys(' '.join(c['domain'].split()) for c in valid))
+        with _timed(timings, 'count'):
+            counts = dict(zip(unique, self._count_results_parallel(model_name, unique)))
+        for candidate in valid:
+            count, error = counts[' '.join(candidate['domain'].split())]
+            candidate['count'] = count
+            if error:
+                # Domaine syntaxiquement correct mais refusé par l'ORM
+                candidate.update(valid=False, error="Erreur Odoo : %s" % error)
+        return candidates
+
+    def _repair_domain(self, model_name, candidates, timings=None):
+        """Boucle de correction : renvoie à VLLM l'erreur du domaine proposé.
+
+        La conversation reprend le prompt de génération du domaine (même préfixe, servi
+        par le cache de préfixes), la réponse erronée puis l'erreur constatée localement.
+        Les tentatives sont limitées en nombre et par un budget de temps (fiche société).
+
+        :param candidates: candidats déjà évalués, tous invalides
+        :return: candidats de toutes les tentatives (les plus récents en premier)
+        """
+        company = self.env.company
+        deadline = time.time() + company.is_vllm_repair_budget
+        system_prompt, prompt = self._get_domain_prompts(model_name)
+        failed = next((c for c in candidates if c['domain']), candidates[0])
+        history = [{'role': 'user', 'content': prompt}]
+        attempt = 0
+        while attempt < company.is_vllm_repair_attempts and time.time() < deadline:
+            attempt += 1
+            history.append({'role': 'assistant', 'content': failed['response']})
+            feedback = (
+                "Ce domaine n'est pas valide.\n"
+                "Erreur : %s\n\n"
+                "Corrige-le en n'utilisant que les champs listés ci-dessus. "
+                "Réponds UNIQUEMENT avec le domaine corrigé entre ```python et ```."
+            ) % failed['error']
+            with _timed(timings, 'repair'):
+                result = self.env['is.vllm'].vllm_send_prompt(
+                    feedback, system_prompt=system_prompt, history=history, stage='domain',
+                )
+            self._track_queue_wait(result, timings, 'repair')
+            history.append({'role': 'user', 'content': feedback})
+            if not result['success']:
+                _logger.warning("Recherche générale [%s] correction du domaine, tentative %s : %s",
+                                self.name, attempt, result['error'])
+                break
+            repaired = self._evaluate_domain_candidates(model_name, [result['response']], timings=timings)[0]
+            _logger.info("Recherche générale [%s] correction du domaine, tentative %s : %s (%s) -> %s (%s)",
+                         self.name, attempt, failed['domain'], failed['error'], repaired['domain'],
+                         'valide' if repaired['valid'] else repaired['error'])
+            self.domain_repairs = attempt
+            self.vllm_domain_response = "%s\n\n----- Correction %s -----\n\n%s" % (
+                self.vllm_domain_response or '', attempt, result['response'])
+            candidates = [repaired] + candidates
+            if repaired['valid']:
+                break
+            failed = repaired
+        return candidates
+
+    def _count_results_parallel(self, model_name, domain_strs):
+        """Compte les résultats de plusieurs domaines en parallèle (un curseur par thread).
+
+        Le nombre de threads, donc de connexions simultanées, est limité par le paramètre
+        société 'Requêtes parallèles par lot'.
+
+        :return: liste de (nombre, erreur), voir _try_count_results
+        """
+        if len(domain_strs) <= 1:
+            return [self._try_count_results(model_name, d) for d in domain_strs]
+
+        registry = self.env.registry
+        uid = self.env.uid
+        context = dict(self.env.context)
+
+        def count(domain_str):
+            with registry.cursor() as cr:
+                env = api.Environment(cr, uid, context)
+                return env['is.search.general']._try_count_results(model_name, domain_str)
+
+        max_workers = min(len(domain_strs), max(self.env.company.is_vllm_batch_concurrency, 1))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(count, domain_strs))
+
+    def action_search(self):
+        """Lance la recherche : identifie le modèle puis génère le domaine."""
+        self.ensure_one()
+        if not self.question:
+            raise UserError("Veuillez saisir une recherche.")
+
+        start = time.time()
+        timings = {}
+        self.temps_attente = 0.0
+        model_name = None
+
+        # Recherche simple (type de document, période, état) : domaine construit
+        # localement, sans appel à VLLM
+        fast = None
+        if self.env.company.is_vllm_fast_path:
+            with _timed(timings, 'fast_path'):
+                fast = self._try_fast_path()
+        if fast:
+            model_name, count = fast
+        else:
+            self.fast_path = False
+            # Étape 1 : Identifier le modèle
+            if self.model_id:
+                model_name = self.model_id.model
+                self.vllm_model_response = "Modèle sélectionné manuellement : %s" % model_name
+            else:
+                # Identification déjà lancée pendant la saisie de la question
+                result = None
+                if self.env.company.is_vllm_prefetch:
+                    with _timed(timings, 'prefetch'):
+                        result = self._get_prefetched_model()
+                if result is None:
+                    with _timed(timings, 'catalog'):
+                        spec = self._get_model_spec()
+                    with _timed(timings, 'identification'):
+                        result = self.env['is.vllm'].vllm_send_prompt(**spec)
+                self._track_queue_wait(result, timings, 'identification')
+                if not result['success']:
+                    raise UserError("Erreur VLLM (identification modèle) : %s" % result['error'])
 
-        # Étape 3 : Déterminer le type de vue si non renseigné
-        if not self.view_type:
-            result = self._ask_vllm_for_view_type()
-            if result['success']:
                 response = result['response'].strip()
-                self.vllm_view_type_response = response
-                # Nettoyer la réponse
-                view_type = response.split('\n')[0].strip().strip('`').strip().lower()
-                if view_type in ('tree', 'graph', 'pivot'):
-                    self.view_type = view_type
+                self.vllm_model_response = response
+
+                # Nettoyer la réponse (enlever les éventuels retours à la ligne, espaces, etc.)
+                candidate = response.split('\n')[0].strip().strip('`').strip()
+
+                # Vérifier que le modèle existe
+                model_rec = self.env['ir.model'].sudo().search([('model', '=', candidate)], limit=1)
+                if not model_rec:
+                    raise UserError(
+                        "VLLM a proposé le modèle '%s' mais il n'existe pas dans Odoo.\n\n"
+                        "Réponse VLLM :\n%s\n\n"
+                        "Vous pouvez sélectionner le modèle manuellement." % (candidate, response)
+                    )
+                # Le catalogue du prompt est commun à tous les utilisateurs
+                if not self.env[candidate].check_access_rights('read', raise_exception=False):
+                    raise UserError(
+                        "VLLM a proposé le modèle '%s' (%s) mais vous n'avez pas accès à ses données.\n\n"
+                        "Vous pouvez sélectionner le modèle manuellement." % (candidate, model_rec.name)
+                    )
+                self.model_id = model_rec.id
+                model_name = candidate
+
+            # Étapes 2 et 3 : le domaine et le type de vue (si non renseigné) sont demandés
+            # en parallèle, ils ne dépendent que du modèle et de la question
+            with _timed(timings, 'schema'):
+                specs = [self._get_domain_spec(model_name, n=self._get_domain_candidates())]
+            if not self.view_type:
+                specs.append(self._get_view_type_spec())
+            results = self.env['is.vllm'].vllm_send_prompts(specs)
+            # Durées propres à chaque appel (exécutés en parallèle)
+            timings['domain'] = results[0]['duration']
+            if len(results) > 1:
+                timings['view_type'] = results[1]['duration']
+
+            # Étape 2 : Générer le domaine (les candidats sont déjà comptés)
+            count = self._generate_domain(model_name, result=results[0], timings=timings)
+
+            # Étape 3 : Déterminer le type de vue si non renseigné
+            if not self.view_type:
+                result = results[1]
+                self._track_queue_wait(result, timings, 'view_type')
+                if result['success']:
+                    response = result['response'].strip()
+                    self.vllm_view_type_response = response
+                    # Nettoyer la réponse
+                    view_type = response.split('\n')[0].strip().strip('`').strip().lower()
+                    if view_type in VIEW_TYPES:
+                        self.view_type = view_type
+                    else:
+                        # Par défaut, utiliser tree
+                        self.view_type = 'tree'
                 else:
-                    # Par défaut, utiliser tree
+                    # En cas d'erreur, utiliser tree par défaut
                     self.view_type = 'tree'
-            else:
-                # En cas d'erreur, utiliser tree par défaut
-                self.view_type = 'tree'
+
+        self._set_nb_results(count)
+        with _timed(timings, 'preview'):
+            self._refresh_preview(count=count)
+        if self.snapshot_enabled:
+            with _timed(timings, 'snapshot'):
+                self._refresh_snapshot()
 
         # Étape 4 : Déterminer le group_by si nécessaire (pour graph/pivot)
         if self.view_type in ('graph', 'pivot') and not self.group_by:
-            result = self._ask_vllm_for_group_by(model_name)
+            with _timed(timings, 'group_by'):
+                result = self._ask_vllm_for_group_by(model_name)
+            self._track_queue_wait(result, timings, 'group_by')
             if result['success']:
-                response = result['response'].strip()
-                self.vllm_group_by_response = response
-                # Nettoyer la réponse
-                group_by = response.split('\n')[0].strip().strip('`').strip().lower()
-                if group_by and group_by != 'none':
-                    self.group_by = group_by
+                self._set_group_by_from_response(model_name, result['response'])
+
+        # Étape 5 : Pré-calculer la synthèse (read_group) pour les vues graph/pivot
+        if self.view_type in ('graph', 'pivot') and self.group_by:
+            with _timed(timings, 'aggregate'):
+                self._refresh_aggregate()
+
+        # Temps de réponse total, toutes étapes comprises
+        self.temps_reponse = round(time.time() - start, 1)
+        self._save_timings(timings)
 
         _logger.info("Recherche générale [%s] modèle=%s domaine=%s nb=%s view_type=%s group_by=%s", 
                      self.name, model_name, self.domain, count, self.view_type, self.group_by)
@@ -415,7 +1243,7 @@ class IsSearchGeneral(models.Model):
                 'target': 'current',
             }
 
-        # Étape 5 : Ouvrir la vue appropriée avec le domaine calculé
+        # Étape 6 : Ouvrir la vue appropriée avec le domaine calculé
         return self._open_result_list(model_name, self.domain, self.view_type, self.group_by)
 
     def action_open_results(self):
@@ -423,15 +1251,225 @@ class IsSearchGeneral(models.Model):
         self.ensure_one()
         if not self.model_name or not self.domain:
             raise UserError("Lancez d'abord une recherche.")
-        
-        # Recalculer le nombre d'enregistrements (au cas où le domaine a été modifié)
-        count = self._count_results(self.model_name, self.domain)
-        self.nb_results = count
-        
+
         # Utiliser le view_type enregistré, ou tree par défaut
         view_type = self.view_type or 'tree'
+
+        # Instantané : ré-ouverture directe sur les ids mémorisés, sans recompter
+        snapshot_ids = self._get_snapshot_ids()
+        if snapshot_ids is not None:
+            return self._open_result_list(self.model_name, self.domain, view_type, self.group_by,
+                                          domain=[('id', 'in', snapshot_ids)])
+
+        # Recalculer le nombre d'enregistrements (au cas où le domaine a été modifié)
+        count = self._count_results(self.model_name, self.domain)
+        self._set_nb_results(count)
         return self._open_result_list(self.model_name, self.domain, view_type, self.group_by)
 
+    def action_open_summary(self):
+        """Affiche la synthèse pré-calculée (read_group), recalculée si elle a expiré."""
+        self.ensure_one()
+        if not self.model_name or not self.domain:
+            raise UserError("Lancez d'abord une recherche.")
+        if not self.group_by:
+            raise UserError("Aucun regroupement (group_by) défini pour cette recherche.")
+        if not self._is_aggregate_fresh():
+            self._refresh_aggregate()
+        return {
+            'type': 'ir.actions.act_window',
+            'name': 'Synthèse : %s' % self.question[:80],
+            'res_model': 'is.search.general',
+            'res_id': self.id,
+            'view_mode': 'form',
+            'views': [(self.env.ref('is_vllm2odoo.is_search_general_summary_form').id, 'form')],
+            'target': 'new',
+        }
+
+    def _is_aggregate_fresh(self):
+        """Vrai si la synthèse existe et a moins que la durée de validité de la société."""
+        self.ensure_one()
+        if not self.aggregate_data or not self.aggregate_date:
+            return False
+        ttl = datetime.timedelta(minutes=self.env.company.is_vllm_aggregate_ttl)
+        return fields.Datetime.now() - self.aggregate_date < ttl
+
+    def _get_aggregate_measures(self, model_name):
+        """Retourne les mesures (champs numériques agrégeables) de la synthèse."""
+        model = self.env[model_name]
+        measures = []
+        for ftype in ('monetary', 'float'):
+            for fname, fobj in model._fields.items():
+                if fobj.type == ftype and fobj.store and fobj.group_operator and not fname.startswith('_'):
+                    measures.append(fname)
+        return measures[:AGGREGATE_MAX_MEASURES]
+
+    def _refresh_aggregate(self):
+        """Calcule une fois le read_group de la recherche et le mémorise (synthèse).
+
+        Le read_group est fait avec les droits de l'utilisateur, comme celui de la vue
+        graphique / tableau croisé qu'il remplace : la synthèse ne porte que sur les
+        enregistrements qu'il peut lire (règles multi-sociétés comprises).
+        """
+        self.ensure_one()
+        model_name = self.model_name
+        if not self._is_valid_group_by(model_name, self.group_by):
+            self.write({'aggregate_data': False, 'aggregate_date': False})
+            return
+        model = self.env[model_name]
+        group_field = model._fields[self.group_by.split(':')[0]]
+        measures = self._get_aggregate_measures(model_name)
+        try:
+            domain = safe_eval(self.domain, {
+                'datetime': datetime,
+                'context_today': datetime.datetime.now,
+            })
+            with self.env.cr.savepoint(flush=False):
+                groups = model.read_group(domain, measures, [self.group_by], lazy=False, limit=AGGREGATE_MAX_ROWS)
+        except Exception as e:
+            _logger.warning("Synthèse [%s] impossible : %s", self.name, str(e))
+            self.write({'aggregate_data': False, 'aggregate_date': False})
+            return
+
+        selection = {}
+        if group_field.type == 'selection':
+            selection = dict(group_field._description_selection(self.env))
+        rows = []
+        for group in groups:
+            value = group.get(self.group_by)
+            if isinstance(value, (list, tuple)):
+                value = value[1]
+            elif group_field.type == 'selection':
+                value = selection.get(value, value)
+            rows.append([str(value) if value not in (None, False) else 'Non défini', group.get('__count', 0)]
+                        + [group.get(m) or 0 for m in measures])
+        data = {
+            'group_by':       self.group_by,
+            'group_by_label': group_field.string,
+            'measures':       [model._fields[m].string for m in measures],
+            'rows':           rows,
+        }
+        self.write({
+            'aggregate_data': json.dumps(data),
+            'aggregate_date': fields.Datetime.now(),
+        })
+
+    def action_refresh_preview(self):
+        """Recompte les résultats et met à jour l'aperçu (ex: après modification du domaine)."""
+        self.ensure_one()
+        if not self.model_name or not self.domain:
+            raise UserError("Lancez d'abord une recherche.")
+        self._set_nb_results(self._refresh_preview())
+
+    def _refresh_preview(self, count=None):
+        """Lit les premiers enregistrements du domaine et enregistre l'aperçu HTML.
+
+        Les N premiers enregistrements (paramètre société) sont lus avec les droits de
+        l'utilisateur, en une requête. Le nombre affiché sous l'aperçu est celui des
+        enregistrements visibles par l'utilisateur : déduit de la lecture quand il y a
+        moins de N résultats, sinon compté avec ses droits (au plus PREVIEW_COUNT_LIMIT).
+        Si le nombre de résultats n'est pas fourni, un comptage est lancé.
+
+        :param count: Nombre de résultats déjà connu
+        :return: nombre de résultats
+        """
+        self.ensure_one()
+        size = self.env.company.is_vllm_preview_size
+        model_name = self.model_name
+        if size <= 0 or not model_name or model_name not in self.env:
+            self.preview_html = False
+            return self._count_results(model_name, self.domain) if count is None else count
+        model = self.env[model_name]
+        try:
+            domain = safe_eval(self.domain, {
+                'datetime': datetime,
+                'context_today': datetime.datetime.now,
+            })
+            with self.env.cr.savepoint(flush=False):
+                records = model.search(domain, limit=size)
+                key_fields = [f for f in PREVIEW_KEY_FIELDS
+                              if f in model._fields and f != model._rec_name][:PREVIEW_MAX_FIELDS]
+                rows = records.read(['display_name'] + key_fields)
+                visible = len(records)
+                if visible == size:
+                    visible = model.search_count(domain, limit=PREVIEW_COUNT_LIMIT)
+        except Exception as e:
+            _logger.info("Aperçu [%s] impossible : %s", self.name, str(e))
+            self.preview_html = False
+            return self._count_results(model_name, self.domain) if count is None else count
+
+        if count is None:
+            count = visible if visible < size else self._count_results(model_name, self.domain)
+        head = ''.join('<th>%s</th>' % tools.html_escape(model._fields[f].string)
+                       for f in ['display_name'] + key_fields)
+        body = ''.join(
+            '<tr>%s</tr>' % ''.join(
+                '<td>%s</td>' % tools.html_escape(self._format_preview_value(model._fields[f], row.get(f)))
+                for f in ['display_name'] + key_fields
+            )
+            for row in rows
+        )
+        more = ''
+        if visible > len(rows):
+            more = '<p class="text-muted">%s enregistrement(s) sur %s%s.</p>' % (
+                len(rows), 'plus de ' if visible >= PREVIEW_COUNT_LIMIT else '', visible)
+        self.preview_html = (
+            '<table class="table table-sm table-striped">'
+            '<thead><tr>%s</tr></thead><tbody>%s</tbody></table>%s'
+        ) % (head, body, more) if rows else False
+        return count
+
+    def _format_preview_value(self, field, value):
+        """Valeur lisible d'un champ lu par read(), pour l'aperçu."""
+        if value is False or value is None:
+            return ''
+        if field.type == 'many2one':
+            return value[1]
+        if field.type == 'selection':
+            return dict(field._description_selection(self.env)).get(value, value)
+        if field.type == 'date':
+            return tools.format_date(self.env, value)
+        if field.type == 'datetime':
+            return tools.format_datetime(self.env, value)
+        if field.type in ('float', 'monetary'):
+            return tools.formatLang(self.env, value)
+        return str(value)
+
+    def action_refresh_snapshot(self):
+        """Ré-évalue le domaine et met à jour l'instantané des résultats."""
+        self.ensure_one()
+        if not self.model_name or not self.domain:
+            raise UserError("Lancez d'abord une recherche.")
+        self._refresh_snapshot()
+
+    def _refresh_snapshot(self):
+        """Mémorise les ids correspondant au domaine (et met à jour le nombre de résultats)."""
+        self.ensure_one()
+        try:
+            domain = safe_eval(self.domain, {
+                'datetime': datetime,
+                'context_today': datetime.datetime.now,
+            })
+            ids = list(self.env[self.model_name].sudo()._search(domain))
+        except Exception as e:
+            raise UserError("Erreur lors de l'évaluation du domaine :\n%s\n\n%s" % (self.domain, str(e)))
+        packed = _pack_ids(ids)
+        self.write({
+            'snapshot_data': base64.b64encode(packed),
+            'snapshot_date': fields.Datetime.now(),
+        })
+        self._set_nb_results(len(ids))
+        _logger.info("Instantané [%s] : %s ids (%s octets)", self.name, len(ids), len(packed))
+
+    def _get_snapshot_ids(self):
+        """Retourne les ids de l'instantané, ou None s'il n'y en a pas."""
+        self.ensure_one()
+        if not self.snapshot_enabled:
+            return None
+        data = self.with_context(bin_size=False).snapshot_data
+        if not data:
+            return None
+        return _unpack_ids(base64.b64decode(data))
+
     def action_recalculate_domain(self):
         """Recalcule le domaine et le group_by en conservant le modèle identifié."""
         self.ensure_one()
@@ -439,49 +1477,34 @@ class IsSearchGeneral(models.Model):
             raise UserError("Veuillez d'abord identifier le modèle (bouton Rechercher).")
 
         start = time.time()
+        timings = {}
+        self.temps_attente = 0.0
         model_name = self.model_name
 
         # Étape 1 : Générer le domaine
-        result = self._ask_vllm_for_domain(model_name)
-        if not result['success']:
-            raise UserError("Erreur VLLM (génération domaine) : %s" % result['error'])
-
-        response = result['response']
-        self.vllm_domain_response = response
-
-        domain_str = self._extract_text_from_response(response, marker='[')
-        if not domain_str:
-            raise UserError(
-                "VLLM n'a pas retourné de domaine valide.\n\n"
-                "Réponse reçue :\n%s" % response
-            )
+        count = self._generate_domain(model_name, timings=timings)
 
-        validation = self._validate_domain(domain_str)
-        if not validation['valid']:
-            raise UserError(
-                "Le domaine proposé par VLLM n'est pas valide :\n%s\n\n"
-                "Domaine proposé :\n%s" % (validation['error'], domain_str)
-            )
-
-        self.domain = validation['domain']
-        
         # Étape 2 : Recalculer le group_by si view_type est graph/pivot
         if self.view_type in ('graph', 'pivot'):
-            result = self._ask_vllm_for_group_by(model_name)
+            with _timed(timings, 'group_by'):
+                result = self._ask_vllm_for_group_by(model_name)
+            self._track_queue_wait(result, timings, 'group_by')
             if result['success']:
-                response = result['response'].strip()
-                self.vllm_group_by_response = response
-                # Nettoyer la réponse
-                group_by = response.split('\n')[0].strip().strip('`').strip().lower()
-                if group_by and group_by != 'none':
-                    self.group_by = group_by
-        
-        # Compter les enregistrements
-        count = self._count_results(model_name, self.domain)
-        self.nb_results = count
+                self._set_group_by_from_response(model_name, result['response'])
         
+        self._set_nb_results(count)
+        with _timed(timings, 'preview'):
+            self._refresh_preview(count=count)
+        if self.snapshot_enabled:
+            with _timed(timings, 'snapshot'):
+                self._refresh_snapshot()
+        if self.view_type in ('graph', 'pivot') and self.group_by:
+            with _timed(timings, 'aggregate'):
+                self._refresh_aggregate()
+
         elapsed = time.time() - start
         self.temps_reponse = round(elapsed, 1)
+        self._save_timings(timings)
 
         _logger.info("Domaine recalculé [%s] domaine=%s nb=%s group_by=%s", 
                      self.name, self.domain, count, self.group_by)
@@ -556,26 +1579,162 @@ class IsSearchGeneral(models.Model):
             },
         }
 
+    def _set_nb_results(self, count):
+        """Enregistre le nombre de résultats avec la date et la marque de modification du modèle."""
+        for rec in self:
+            rec.write({
+                'nb_results':           count,
+                'nb_results_date':      fields.Datetime.now(),
+                'nb_results_watermark': rec._get_model_watermark(rec.model_name),
+            })
+
+    def _get_model_watermark(self, model_name):
+        """Retourne une marque de modification de la table d'un modèle.
+
+        Combine max(id), qui avance à chaque création, et les compteurs d'insertions /
+        mises à jour / suppressions de pg_stat_user_tables, qui bougent aussi sur les
+        modifications et suppressions. Les deux sont obtenus sans parcourir la table,
+        contrairement à max(write_date) qui n'est pas indexé.
+
+        Pas de marque (False, donc recomptage à chaque passage) pour les modèles sans
+        table propre : modèles abstraits et vues SQL (_auto = False ou _table_query),
+        dont max(id) exécuterait toute la vue et que pg_stat_user_tables ne suit pas.
+        """
+        if not model_name or model_name not in self.env:
+            return False
+        model = self.env[model_name]
+        if model._abstract or not model._auto or model._table_query:
+            return False
+        self.env.cr.execute("""
+            SELECT COALESCE(n_tup_ins, 0) + COALESCE(n_tup_upd, 0) + COALESCE(n_tup_del, 0)
+              FROM pg_stat_user_tables
+             WHERE relname = %s AND schemaname = current_schema()
+        """, [model._table])
+        row = self.env.cr.fetchone()
+        self.env.cr.execute('SELECT max(id) FROM "%s"' % model._table)
+        return '%s/%s' % (self.env.cr.fetchone()[0] or 0, row[0] if row else 0)
+
+    @api.model
+    def _cron_refresh_nb_results(self, time_budget=60):
+        """Tâche planifiée : rafraîchit les nombres de résultats des recherches enregistrées.
+
+        Les recherches sont traitées par modèle, en commençant par les comptages les plus
+        anciens. Un modèle dont la table n'a pas changé depuis le dernier comptage est
+        ignoré, sauf si ce comptage date d'un jour précédent (domaines relatifs à la date
+        du jour). Les domaines d'un même modèle sont comptés par lots en une requête SQL,
+        et la tâche s'arrête une fois le budget de temps (en secondes) écoulé.
+        """
+        start = time.time()
+        today = fields.Datetime.to_datetime(fields.Date.context_today(self))
+        searches = self.sudo().with_context(tracking_disable=True).search(
+            [('model_name', '!=', False), ('domain', '!=', False)],
+            order='nb_results_date asc nulls first, id',
+        )
+        by_model = defaultdict(lambda: self.sudo().browse())
+        for search in searches:
+            by_model[search.model_name] |= search
+
+        nb_refreshed = 0
+        for model_name, records in by_model.items():
+            if time.time() - start > time_budget:
+                break
+            if model_name not in self.env:
+                continue
+            watermark = self._get_model_watermark(model_name)
+            stale = records.filtered(
+                lambda r: r.nb_results_watermark != watermark
+                or not r.nb_results_date or r.nb_results_date < today
+            )
+            for batch_ids in split_every(COUNT_BATCH_SIZE, stale.ids):
+                batch = records.browse(batch_ids)
+                counts = self._count_results_batch(model_name, batch.mapped('domain'))
+                now = fields.Datetime.now()
+                for rec, count in zip(batch, counts):
+                    rec.write({
+                        'nb_results':           count,
+                        'nb_results_date':      now,
+                        'nb_results_watermark': watermark,
+                    })
+                nb_refreshed += len(batch)
+                self.env.cr.commit()
+                if time.time() - start > time_budget:
+                    break
+
+        _logger.info("Recherche générale : %s comptage(s) rafraîchi(s) sur %s en %.1fs",
+                     nb_refreshed, len(searches), time.time() - start)
+
+    def _count_results_batch(self, model_name, domain_strs):
+        """Compte plusieurs domaines d'un même modèle, en une requête SQL si possible.
+
+        Les domaines qui partagent la même clause FROM sont comptés ensemble avec
+        count(*) FILTER (WHERE ...). En cas d'erreur, chaque domaine est compté séparément.
+        """
+        model = self.env[model_name].sudo()
+        eval_context = {
+            'datetime': datetime,
+            'context_today': datetime.datetime.now,
+        }
+        counts = [0] * len(domain_strs)
+        queries = defaultdict(list)
+        for index, domain_str in enumerate(domain_strs):
+            try:
+                query = model._where_calc(safe_eval(domain_str, eval_context))
+                from_clause, where_clause, params = query.get_sql()
+                # Les paramètres des jointures (clause FROM) précèdent ceux du WHERE
+                nb_from_params = from_clause.count('%s')
+                from_key = (from_clause, tuple(params[:nb_from_params]))
+                queries[from_key].append((index, where_clause or 'TRUE', list(params[nb_from_params:])))
+            except Exception:
+                counts[index] = self._count_results(model_name, domain_str)
+
+        self.env.flush_all()
+        for (from_clause, from_params), items in queries.items():
+            select = ', '.join('count(*) FILTER (WHERE %s)' % where for _i, where, _p in items)
+            params = [p for _i, _w, item_params in items for p in item_params] + list(from_params)
+            try:
+                with self.env.cr.savepoint():
+                    self.env.cr.execute('SELECT %s FROM %s' % (select, from_clause), params)
+                    row = self.env.cr.fetchone()
+                for (index, _w, _p), count in zip(items, row):
+                    counts[index] = count
+            except Exception:
+                for index, _w, _p in items:
+                    counts[index] = self._count_results(model_name, domain_strs[index])
+        return counts
+
     def _count_results(self, model_name, domain_str):
         """Compte le nombre d'enregistrements correspondant au domaine."""
-        try:
-            domain = safe_eval(domain_str, {
-                'datetime': datetime,
-                'context_today': datetime.datetime.now,
-            })
-            return self.env[model_name].sudo().search_count(domain)
-        except Exception:
-            return 0
+        return self._try_count_results(model_name, domain_str)[0]
 
-    def _open_result_list(self, model_name, domain_str, view_type='tree', group_by=None):
-        """Ouvre la vue du modèle avec le domaine donné et le type de vue approprié."""
+    def _try_count_results(self, model_name, domain_str):
+        """Compte les enregistrements du domaine et retourne (nombre, erreur).
+
+        Une erreur de l'ORM (champ inexistant, valeur incompatible...) est retournée
+        au lieu d'être levée, avec un nombre de 0 ; la transaction reste utilisable.
+        """
         try:
             domain = safe_eval(domain_str, {
                 'datetime': datetime,
                 'context_today': datetime.datetime.now,
             })
+            with self.env.cr.savepoint(flush=False):
+                return self.env[model_name].sudo().search_count(domain), ''
         except Exception as e:
-            raise UserError("Erreur lors de l'évaluation du domaine :\n%s\n\n%s" % (domain_str, str(e)))
+            return 0, str(e).strip().split('\n')[0]
+
+    def _open_result_list(self, model_name, domain_str, view_type='tree', group_by=None, domain=None):
+        """Ouvre la vue du modèle avec le domaine donné et le type de vue approprié.
+
+        :param domain: Domaine déjà évalué (ex: instantané), utilisé à la place de domain_str
+        """
+        if domain is None:
+            try:
+                domain = safe_eval(domain_str, {
+                    'datetime': datetime,
+                    'context_today': datetime.datetime.now,
+                })
+            except Exception as e:
+                raise UserError("Erreur lors de l'évaluation du domaine :\n%s\n\n%s" % (domain_str, str(e)))
 
         # Déterminer le view_mode en fonction du type de vue
         if view_type == 'graph':
@@ -603,3 +1762,286 @@ class IsSearchGeneral(models.Model):
             action['context'] = context
 
         return action
+
+
+class IsVllm(models.AbstractModel):
+    _inherit = 'is.vllm'
+
+    @api.model
+    def _get_warmup_prompts(self):
+        """Ajoute les préfixes statiques de la recherche générale au préchauffage.
+
+        La question est vide : seul le préfixe commun (system prompt, catalogue des
+        modèles, schéma du modèle) est utile au cache de préfixes du serveur.
+        """
+        prompts = super()._get_warmup_prompts()
+        search = self.env['is.search.general'].new({'question': ''})
+        prompts.append(('catalogue des modèles', 'identification') + search._get_model_prompts())
+        prompts.append(('domaine', 'domain') + search._get_domain_prompts('res.partner'))
+        prompts.append(('type de vue', 'view_type') + search._get_view_type_prompts())
+        prompts.append(('regroupement', 'group_by') + search._get_group_by_prompts('res.partner'))
+        return prompts
+
+
+class IsSearchGeneralTiming(models.Model):
+    """Durée d'une étape d'une recherche générale (décomposition du temps de réponse)."""
+    _name = 'is.search.general.timing'
+    _description = 'Recherche générale : temps par étape'
+    _order = 'search_id, id'
+
+    search_id = fields.Many2one(
+        'is.search.general',
+        string='Recherche',
+        required=True,
+        ondelete='cascade',
+        index=True,
+    )
+    model_id = fields.Many2one(
+        related='search_id.model_id',
+        store=True,
+    )
+    stage = fields.Selection(
+        TIMING_STAGES,
+        string='Étape',
+        required=True,
+    )
+    duration = fields.Float(
+        string='Durée (s)',
+        digits=(16, 3),
+        group_operator='avg',
+    )
+
+
+class IsSearchGeneralCatalog(models.Model):
+    """Statistiques d'un modèle du catalogue proposé à VLLM pour l'identification.
+
+    Actualisées périodiquement (estimation du nombre de lignes par PostgreSQL et
+    nombre de recherches réussies), elles permettent d'écarter les tables vides
+    et de placer les modèles les plus recherchés en tête, sans coût par recherche.
+    """
+    _name = 'is.search.general.catalog'
+    _description = 'Recherche générale : catalogue des modèles'
+    _order = 'popularity desc, model'
+    _rec_name = 'model'
+
+    model_id = fields.Many2one(
+        'ir.model',
+        string='Modèle Odoo',
+        required=True,
+        ondelete='cascade',
+        index=True,
+    )
+    model = fields.Char(
+        related='model_id.model',
+        store=True,
+    )
+    row_estimate = fields.Integer(
+        string='Lignes (estimation)',
+        readonly=True,
+        help="Estimation PostgreSQL du nombre de lignes de la table (pg_class.reltuples). "
+             "-1 = inconnue (table jamais analysée) : le modèle est conservé.",
+    )
+    popularity = fields.Integer(
+        string='Recherches réussies',
+        readonly=True,
+        help="Nombre de recherches générales sur ce modèle ayant trouvé des résultats.",
+    )
+    inclusion = fields.Selection(
+        [
+            ('auto', 'Automatique'),
+            ('always', 'Toujours'),
+            ('never', 'Jamais'),
+        ],
+        string='Inclusion',
+        default='auto',
+        required=True,
+        help="Automatique : le modèle est proposé si sa table n'est pas vide.",
+    )
+    stats_date = fields.Datetime(
+        string='Statistiques du',
+        readonly=True,
+    )
+
+    _sql_constraints = [
+        ('model_id_uniq', 'unique(model_id)', "Ce modèle est déjà dans le catalogue."),
+    ]
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.clear_caches()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.clear_caches()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.clear_caches()
+        return res
+
+    def action_refresh_stats(self):
+        self._refresh_stats()
+        return {'type': 'ir.actions.client', 'tag': 'soft_reload'}
+
+    @api.model
+    def _cron_refresh_stats(self):
+        """Tâche planifiée : actualisation des statistiques du catalogue."""
+        self._refresh_stats()
+
+    @api.model
+    def _refresh_stats(self):
+        """Recalcule l'estimation du nombre de lignes et la popularité de chaque modèle."""
+        # Estimation des lignes : statistiques de l'optimiseur (pg_class) complétées par
+        # le nombre de lignes vivantes (pg_stat_user_tables), sans parcourir les tables
+        self.env.cr.execute("""
+            SELECT c.relname, c.reltuples, s.n_live_tup
+              FROM pg_class c
+              JOIN pg_namespace n ON n.oid = c.relnamespace
+              LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+             WHERE n.nspname = current_schema()
+               AND c.relkind IN ('r', 'p')
+        """)
+        table_rows = {}
+        for table, reltuples, live in self.env.cr.fetchall():
+            if reltuples < 0:
+                table_rows[table] = live if live else -1
+            else:
+                table_rows[table] = max(int(reltuples), live or 0)
+
+        # Popularité : recherches ayant trouvé des résultats, par modèle
+        popularity = {
+            group['model_id'][0]: group['model_id_count']
+            for group in self.env['is.search.general'].sudo().read_group(
+                [('model_id', '!=', False), ('nb_results', '>', 0)], ['model_id'], ['model_id'],
+            )
+        }
+
+        existing = {rec.model_id.id: rec for rec in self.sudo().search([])}
+        now = fields.Datetime.now()
+        vals_list = []
+        unchanged = self.browse()
+        installed = self.env['is.search.general']._get_installed_models()
+        for ir_model in installed:
+            model = self.env[ir_model.model]
+            # Vues SQL et tables jamais analysées : nombre de lignes inconnu, modèle conservé
+            if not model._auto or model._table_query:
+                row_estimate = -1
+            else:
+                row_estimate = table_rows.get(model._table, -1)
+            vals = {
+                'row_estimate': row_estimate,
+                'popularity':   popularity.get(ir_model.id, 0),
+                'stats_date':   now,
+            }
+            rec = existing.get(ir_model.id)
+            if rec:
+                if (rec.row_estimate, rec.popularity) != (vals['row_estimate'], vals['popularity']):
+                    rec.write(vals)
+                else:
+                    unchanged |= rec
+            else:
+                vals_list.append(dict(vals, model_id=ir_model.id))
+        unchanged.write({'stats_date': now})
+        if vals_list:
+            self.sudo().create(vals_list)
+        # Modèles désinstallés ou abstraits : sortis du catalogue
+        installed_ids = set(installed.ids)
+        obsolete = [rec.id for model_id, rec in existing.items() if model_id not in installed_ids]
+        self.sudo().browse(obsolete).unlink()
+        self.clear_caches()
+        _logger.info("Catalogue de la recherche générale : statistiques de %s modèles actualisées",
+                     len(existing) + len(vals_list))
+
+
+class IsSearchGeneralPrefetch(models.Model):
+    """Identification du modèle lancée en arrière-plan pendant la saisie de la question."""
+    _name = 'is.search.general.prefetch'
+    _description = 'Recherche générale : identification anticipée'
+    _order = 'id desc'
+    _rec_name = 'question'
+
+    key = fields.Char(
+        string='Clé',
+        required=True,
+        index=True,
+    )
+    question = fields.Text(
+        string='Recherche',
+    )
+    state = fields.Selection(
+        [
+            ('pending',   'En cours'),
+            ('done',      'Terminée'),
+            ('error',     'Erreur'),
+            ('cancelled', 'Abandonnée'),
+        ],
+        string='État',
+        default='pending',
+        required=True,
+    )
+    model_name = fields.Char(
+        string='Modèle identifié',
+    )
+    response = fields.Text(
+        string='Réponse VLLM',
+    )
+    duration = fields.Float(
+        string='Durée (s)',
+        digits=(16, 3),
+    )
+
+    @api.model
+    def _run_prefetch(self, registry, uid, context, key, question):
+        """Thread : identifie le modèle de la question et enregistre le résultat.
+
+        Aucun curseur n'est ouvert pendant l'appel à VLLM : l'identification en cours est
+        enregistrée et la requête préparée sur un premier curseur, le résultat est
+        enregistré sur un second. Les identifications encore en cours du même
+        utilisateur portent sur une question qui a changé : elles sont abandonnées et
+        leur résultat ignoré.
+        """
+        start = time.time()
+        try:
+            with registry.cursor() as cr:
+                env = api.Environment(cr, uid, context)
+                prefetches = env[self._name].sudo()
+                prefetches.search([('create_uid', '=', uid), ('state', '=', 'pending')]).write({
+                    'state': 'cancelled',
+                })
+                prefetch_id = prefetches.create({'key': key, 'question': question}).id
+                spec = env['is.search.general'].new({'question': question})._get_model_spec()
+                vllm = env['is.vllm']
+                request = vllm._prepare_request(priority=PRIORITY_BATCH, **spec)
+
+            # _execute_request n'utilise ni curseur ni environnement
+            result = vllm._execute_request(request)
+
+            with registry.cursor() as cr:
+                env = api.Environment(cr, uid, context)
+                prefetch = env[self._name].sudo().browse(prefetch_id)
+                if not prefetch.exists() or prefetch.state != 'pending':
+                    return
+                vals = {'duration': round(time.time() - start, 3)}
+                if result['success']:
+                    response = result['response'].strip()
+                    model_name = response.split('\n')[0].strip().strip('`').strip()
+                    vals.update(state='done', response=response, model_name=model_name)
+                    # Description du schéma mise en cache pour la génération du domaine
+                    if model_name in env and env[model_name].check_access_rights('read', raise_exception=False):
+                        env['is.search.general']._get_model_fields_description(model_name)
+                else:
+                    vals.update(state='error', response=result['error'])
+                prefetch.write(vals)
+        except Exception:
+            _logger.exception("Recherche générale : échec de l'identification anticipée")
+        finally:
+            _release_prefetch_slot(uid)
+
+    @api.autovacuum
+    def _gc_prefetch(self):
+        """Supprime les identifications anticipées expirées."""
+        limit = fields.Datetime.subtract(fields.Datetime.now(), hours=PREFETCH_TTL_HOURS)
+        self.sudo().search([('create_date', '<', limit)]).unlink()
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""Analyse locale des recherches simples, sans appel à VLLM.
+
+Reconnaît dans une question en français le type de document ('factures', 'devis'...),
+une période ('ce mois', "l'année dernière", 'depuis 2023'...) et des mots-clés d'état
+('brouillon', 'annulées', 'non payées'...). L'analyse n'est retenue que si tous les
+mots de la question sont reconnus : dans le doute, la recherche passe par VLLM.
+
+Les bornes de dates sont des expressions évaluées par safe_eval au moment de la
+recherche (comme celles générées par VLLM) : 'ce mois' reste le mois courant lorsque
+la recherche est relancée plus tard.
+"""
+
+import re
+import unicodedata
+
+_TODAY = "datetime.date.today()"
+_WEEK_START = "(%s - datetime.timedelta(days=%s.weekday()))" % (_TODAY, _TODAY)
+_MONTH_START = "%s.replace(day=1)" % _TODAY
+_NEXT_MONTH_START = "(%s + datetime.timedelta(days=32)).replace(day=1)" % _MONTH_START
+_PREV_MONTH_START = "(%s - datetime.timedelta(days=1)).replace(day=1)" % _MONTH_START
+_QUARTER_START = "datetime.date(%s.year, (%s.month - 1) // 3 * 3 + 1, 1)" % (_TODAY, _TODAY)
+_NEXT_QUARTER_START = "(%s + datetime.timedelta(days=93)).replace(day=1)" % _QUARTER_START
+_PREV_QUARTER_START = "(%s - datetime.timedelta(days=88)).replace(day=1)" % _QUARTER_START
+_YEAR_START = "datetime.date(%s.year, 1, 1)" % _TODAY
+_NEXT_YEAR_START = "datetime.date(%s.year + 1, 1, 1)" % _TODAY
+_PREV_YEAR_START = "datetime.date(%s.year - 1, 1, 1)" % _TODAY
+
+
+def _fmt(expr):
+    return "%s.strftime('%%Y-%%m-%%d')" % expr
+
+
+def _days(expr, days):
+    return "(%s + datetime.timedelta(days=%s))" % (expr, days)
+
+
+def _fixed(start, end):
+    return lambda m: (_fmt(start), _fmt(end) if end else None)
+
+
+def _year(m):
+    year = int(m.group('year'))
+    return "'%04d-01-01'" % year, "'%04d-01-01'" % (year + 1)
+
+
+def _since_year(m):
+    return "'%04d-01-01'" % int(m.group('year')), None
+
+
+def _last_days(m):
+    days = int(m.group('days'))
+    return _fmt(_days(_TODAY, -days)), _fmt(_days(_TODAY, 1))
+
+
+# Périodes : (expression régulière sur le texte normalisé, bornes [début, fin[)
+PERIOD_RULES = [
+    (r"\b(d')?aujourd'?hui\b|\bdu jour\b", _fixed(_TODAY, _days(_TODAY, 1))),
+    (r"\b(d')?hier\b", _fixed(_days(_TODAY, -1), _TODAY)),
+    (r"\b(de )?(la )?semaine (derniere|passee|precedente)\b",
+     _fixed(_days(_WEEK_START, -7), _WEEK_START)),
+    (r"\b(de )?cette semaine\b|\b(de la )?semaine en cours\b",
+     _fixed(_WEEK_START, _days(_WEEK_START, 7))),
+    (r"\b(du )?mois (dernier|passe|precedent)\b", _fixed(_PREV_MONTH_START, _MONTH_START)),
+    (r"\b(de )?ce mois(-ci)?\b|\b(du )?mois en cours\b|\bdu mois\b",
+     _fixed(_MONTH_START, _NEXT_MONTH_START)),
+    (r"\b(du )?trimestre (dernier|passe|precedent)\b", _fixed(_PREV_QUARTER_START, _QUARTER_START)),
+    (r"\b(de )?ce trimestre\b|\b(du )?trimestre en cours\b|\bdu trimestre\b",
+     _fixed(_QUARTER_START, _NEXT_QUARTER_START)),
+    (r"\b(de )?l'annee (derniere|passee|precedente)\b", _fixed(_PREV_YEAR_START, _YEAR_START)),
+    (r"\b(de )?cette annee\b|\b(de )?l'annee en cours\b|\bde l'annee\b",
+     _fixed(_YEAR_START, _NEXT_YEAR_START)),
+    (r"\b(depuis|a partir de) (?P<year>(19|20)\d\d)\b", _since_year),
+    (r"\b(en|de|pour|sur) (?P<year>(19|20)\d\d)\b", _year),
+    (r"\b(des |les |sur les )?(?P<days>\d{1,3}) derniers jours\b", _last_days),
+]
+
+# États : (expression régulière, champ de sélection, valeurs possibles par ordre de préférence).
+# Seules les valeurs existant dans la sélection du modèle sont retenues.
+STATE_RULES = [
+    (r"\b(non payee?s?|impayee?s?)\b", 'payment_state', ('not_paid', 'partial')),
+    (r"\bpayee?s?\b", 'payment_state', ('paid', 'in_payment')),
+    (r"\b(en )?brouillons?\b", 'state', ('draft',)),
+    (r"\bannulee?s?\b", 'state', ('cancel',)),
+    (r"\b(confirmee?s?|validee?s?|comptabilisee?s?)\b", 'state', ('posted', 'sale', 'purchase')),
+    (r"\b(terminee?s?|faite?s?)\b", 'state', ('done',)),
+]
+
+# Types de documents : (expression régulière, modèle, domaine de base)
+MODEL_RULES = [
+    (r"\bfactures? (clients?|de vente)\b", 'account.move', [('move_type', '=', 'out_invoice')]),
+    (r"\bfactures? (fournisseurs?|d'achats?)\b", 'account.move', [('move_type', '=', 'in_invoice')]),
+    (r"\bfactures?\b", 'account.move', [('move_type', 'in', ('out_invoice', 'in_invoice'))]),
+    (r"\bavoirs?\b", 'account.move', [('move_type', 'in', ('out_refund', 'in_refund'))]),
+    (r"\bdevis\b", 'sale.order', [('state', 'in', ('draft', 'sent'))]),
+    (r"\bcommandes? (fournisseurs?|d'achats?)\b", 'purchase.order', []),
+    (r"\bcommandes? (clients?|de vente)\b", 'sale.order', []),
+    (r"\bcommandes?\b", 'sale.order', []),
+    (r"\blivraisons?\b", 'stock.picking', [('picking_type_code', '=', 'outgoing')]),
+    (r"\breceptions?\b", 'stock.picking', [('picking_type_code', '=', 'incoming')]),
+    (r"\bclients?\b", 'res.partner', [('customer_rank', '>', 0)]),
+    (r"\bfournisseurs?\b", 'res.partner', [('supplier_rank', '>', 0)]),
+    (r"\b(contacts?|partenaires?)\b", 'res.partner', []),
+    (r"\b(articles?|produits?)\b", 'product.template', []),
+    (r"\bemployes?\b", 'hr.employee', []),
+]
+
+# Champ de date utilisé pour les périodes (date du document, sinon date de création).
+# Pour un autre modèle, le premier champ existant de DEFAULT_DATE_FIELDS : un champ
+# 'date' n'est pas forcément la date du document (ex: res.partner.date), il n'est
+# retenu que pour les modèles listés ici.
+DATE_FIELDS = {
+    'account.move':      'invoice_date',
+    'account.move.line': 'date',
+    'account.payment':   'date',
+    'sale.order':        'date_order',
+    'purchase.order':    'date_order',
+    'stock.picking':     'scheduled_date',
+    'stock.move':        'date',
+    'res.partner':       'create_date',
+    'product.template':  'create_date',
+    'hr.employee':       'create_date',
+}
+DEFAULT_DATE_FIELDS = ('create_date',)
+
+# Mots sans incidence sur le domaine
+STOPWORDS = {
+    'a', 'affiche', 'afficher', 'au', 'aux', 'ce', 'ces', 'cet', 'cette', 'cherche', 'chercher',
+    'd', 'dans', 'de', 'des', 'donne', 'donner', 'du', 'en', 'et', 'etat', 'l', 'la', 'le', 'les',
+    'liste', 'lister', 'ma', 'mes', 'moi', 'mon', 'montre', 'montrer', 'nos', 'notre', 'pour',
+    'quel', 'quelle', 'quelles', 'quels', 'qui', 'rechercher', 'sont', 'statut', 'toutes', 'tous',
+    'tout', 'trouver', 'un', 'une', 'voir',
+}
+
+
+def normalize(text):
+    """Minuscules, sans accents, apostrophes et espaces uniformisés."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c)).lower()
+    text = text.replace('’', "'").replace('`', "'")
+    return re.sub(r"\s+", ' ', text).strip()
+
+
+def _extract(text, rules):
+    """Retourne la liste des (règle, correspondance) trouvées et le texte sans ces passages."""
+    found = []
+    for rule in rules:
+        match = re.search(rule[0], text)
+        if match:
+            found.append((rule, match))
+            text = text[:match.start()] + ' ' + text[match.end():]
+    return found, text
+
+
+def parse_question(question):
+    """Analyse une question simple.
+
+    :return: dict {'model': modèle ou None, 'base': [termes], 'states': [(champ, valeurs)],
+             'period': (début, fin ou None) ou None}, ou None si la question n'est pas
+             entièrement reconnue
+    """
+    text = normalize(question)
+    if not text:
+        return None
+    models_found, text = _extract(text, MODEL_RULES)
+    periods, text = _extract(text, PERIOD_RULES)
+    states, text = _extract(text, STATE_RULES)
+    if len(models_found) > 1 or len(periods) > 1:
+        return None
+    state_fields = [field for (_pattern, field, _values), _match in states]
+    if len(state_fields) != len(set(state_fields)):
+        # Deux états contradictoires sur le même champ (ex: 'brouillon' et 'annulées')
+        return None
+    if any(word not in STOPWORDS for word in re.findall(r"[a-z0-9]+", text)):
+        return None
+    if not (models_found or periods or states):
+        return None
+    result = {'model': None, 'base': [], 'states': [], 'period': None}
+    if models_found:
+        (_pattern, model, base), _match = models_found[0]
+        result['model'] = model
+        # Un mot-clé d'état remplace le filtre implicite du type de document sur le même
+        # champ : 'devis annulés' = devis à l'état annulé, pas brouillon ET annulé
+        result['base'] = [term for term in base if term[0] not in state_fields]
+    if periods:
+        (_pattern, builder), match = periods[0]
+        result['period'] = builder(match)
+    result['states'] = [(field, values) for (_pattern, field, values), _match in states]
+    return result
@@ -4,11 +4,55 @@ import base64
 import io
 import json
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
 import requests
-from odoo import api, models
+from odoo import api, fields, models
+from odoo.exceptions import UserError
 
 _logger = logging.getLogger(__name__)
 
+# Étapes pouvant être routées vers un modèle / serveur dédié (champs is_vllm_<étape>_url/_model)
+VLLM_STAGES = ('identification', 'domain', 'view_type', 'group_by', 'chat')
+
+# Classes de priorité pour l'admission des requêtes (l'interactif passe avant le batch)
+PRIORITY_INTERACTIVE = 'interactive'
+PRIORITY_BATCH = 'batch'
+# Intervalle d'interrogation des créneaux libres (s) selon la priorité
+ADMISSION_POLL_INTERVAL = {
+    PRIORITY_INTERACTIVE: 0.05,
+    PRIORITY_BATCH:       0.5,
+}
+# Verrou partagé tenu par les requêtes interactives en attente (le batch leur cède la place)
+ADMISSION_WAITING_KEY = 'is_vllm:interactive_waiting'
+
+# Session HTTP partagée par les threads d'un worker (connexions keep-alive réutilisées)
+HTTP_POOL_SIZE = 32
+_http_session = None
+_http_session_lock = threading.Lock()
+
+
+def _get_http_session():
+    """Retourne la session HTTP du worker, créée au premier appel."""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _http_session = session
+        return _http_session
+
+
+# Marqueur remplacé par les images lors de l'écriture en flux du corps de la requête
+STREAM_IMAGES_PLACEHOLDER = '__IS_VLLM_STREAM_IMAGES__'
+# Taille des blocs lus avant encodage base64 (multiple de 3 : pas de padding intermédiaire)
+STREAM_CHUNK_SIZE = 3 * 256 * 1024
+
 
 class IsVllm(models.AbstractModel):
     """Modèle générique réutilisable pour communiquer avec un serveur VLLM.
@@ -21,16 +65,30 @@ class IsVllm(models.AbstractModel):
     _description = 'Communication VLLM'
 
     @api.model
-    def _get_vllm_config(self):
-        """Récupère la configuration VLLM depuis la fiche société."""
+    def _get_vllm_config(self, stage=None):
+        """Récupère la configuration VLLM depuis la fiche société.
+
+        :param stage: Étape appelante (voir VLLM_STAGES). Le modèle et l'URL spécifiques
+                      à l'étape sont utilisés s'ils sont renseignés, sinon ceux par défaut.
+
+        La clé de contexte 'vllm_config_override' (dict) permet de remplacer des valeurs
+        sans modifier la fiche société (tests de charge, évaluation de modèles).
+        """
         company = self.env.company
+        url = company.is_vllm_url
+        model = company.is_vllm_model
+        if stage in VLLM_STAGES:
+            url = company['is_vllm_%s_url' % stage] or url
+            model = company['is_vllm_%s_model' % stage] or model
         config = {
-            'url':         company.is_vllm_url or '',
+            'url':         url or '',
             'api_key':     company.is_vllm_api_key or '',
-            'model':       company.is_vllm_model or '',
+            'model':       model or '',
             'temperature': company.is_vllm_temperature,
             'max_tokens':  company.is_vllm_max_tokens,
+            'guided_decoding': company.is_vllm_guided_decoding,
         }
+        config.update(self.env.context.get('vllm_config_override') or {})
         return config
 
     @api.model
@@ -59,7 +117,104 @@ class IsVllm(models.AbstractModel):
         return images_b64
 
     @api.model
-    def vllm_send_prompt(self, prompt, system_prompt=None, images_b64=None, model=None, temperature=None, max_tokens=None):
+    def _pdf_page_texts(self, pdf_path=None, pdf_data=None):
+        """Extrait la couche texte de chaque page d'un PDF, sans le rendre en images.
+
+        :param pdf_path: Chemin du PDF sur disque (filestore)
+        :param pdf_data: Contenu binaire du PDF, si pdf_path n'est pas fourni
+        :return: liste de textes (une chaîne par page, vide si la page n'a pas de texte),
+                 ou None si le PDF ne peut pas être lu
+        """
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            _logger.warning("pypdf n'est pas installé. Installez-le avec : pip install pypdf")
+            return None
+        try:
+            reader = PdfReader(pdf_path or io.BytesIO(pdf_data))
+            return [(page.extract_text() or '').strip() for page in reader.pages]
+        except Exception as e:
+            _logger.error("Erreur lors de l'extraction du texte du PDF : %s", str(e))
+            return None
+
+    @api.model
+    def _pdf_page_count(self, pdf_path):
+        """Retourne le nombre de pages d'un PDF stocké sur disque (0 si illisible)."""
+        try:
+            from pdf2image import pdfinfo_from_path
+        except ImportError:
+            _logger.warning("pdf2image n'est pas installé. Installez-le avec : pip install pdf2image")
+            return 0
+        try:
+            return int(pdfinfo_from_path(pdf_path).get('Pages', 0))
+        except Exception as e:
+            _logger.error("Erreur lors de la lecture du PDF %s : %s", pdf_path, str(e))
+            return 0
+
+    @api.model
+    def _pdf_page_png_chunks(self, pdf_path, page):
+        """Rend une seule page d'un PDF en PNG et produit ses octets.
+
+        Une seule page est en mémoire à la fois, quel que soit le nombre de pages du PDF.
+        """
+        from pdf2image import convert_from_path
+        images = convert_from_path(pdf_path, dpi=200, first_page=page, last_page=page)
+        while images:
+            # Image retirée de la liste : libérée dès qu'elle est encodée
+            image = images.pop(0)
+            buf = io.BytesIO()
+            image.save(buf, format='PNG')
+            image = None
+            yield buf.getvalue()
+
+    @api.model
+    def _file_chunks(self, path):
+        """Lit un fichier (ex: filestore) par blocs."""
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(STREAM_CHUNK_SIZE)
+                if not chunk:
+                    return
+                yield chunk
+
+    @api.model
+    def _iter_base64(self, chunks):
+        """Encode en base64 un flux d'octets, bloc par bloc."""
+        remainder = b''
+        for chunk in chunks:
+            data = remainder + chunk
+            cut = len(data) - len(data) % 3
+            remainder = data[cut:]
+            if cut:
+                yield base64.b64encode(data[:cut])
+        if remainder:
+            yield base64.b64encode(remainder)
+
+    @api.model
+    def _iter_request_body(self, payload, image_sources):
+        """Écrit le corps JSON de la requête en flux.
+
+        Le payload est sérialisé avec un marqueur à la place des images ; chaque image
+        est ensuite produite sous forme de data URL, encodée en base64 par blocs à partir
+        de sa source. La mémoire utilisée ne dépend pas du nombre d'images / pages.
+
+        :param image_sources: liste de tuples (fonction sans argument produisant des octets, mime_type)
+        """
+        body = json.dumps(payload)
+        prefix, _sep, suffix = body.rpartition('"%s"' % STREAM_IMAGES_PLACEHOLDER)
+        yield prefix.encode('utf-8')
+        for index, (chunks, mime_type) in enumerate(image_sources):
+            if index:
+                yield b', '
+            yield ('{"type": "image_url", "image_url": {"url": "data:%s;base64,' % mime_type).encode('utf-8')
+            yield from self._iter_base64(chunks())
+            yield b'"}}'
+        yield suffix.encode('utf-8')
+
+    @api.model
+    def vllm_send_prompt(self, prompt, system_prompt=None, images_b64=None, model=None, temperature=None, max_tokens=None, n=None,
+                         guided_choice=None, guided_regex=None, stage=None, priority=PRIORITY_INTERACTIVE,
+                         image_sources=None, history=None):
         """Envoie un prompt au serveur VLLM et retourne la réponse.
 
         :param prompt: Le prompt utilisateur à envoyer
@@ -68,13 +223,47 @@ class IsVllm(models.AbstractModel):
         :param model: Modèle à utiliser (écrase la config société si fourni)
         :param temperature: Température (écrase la config société si fournie)
         :param max_tokens: Nombre max de tokens (écrase la config société si fourni)
-        :return: dict avec 'success' (bool), 'response' (str) et 'error' (str) si erreur
+        :param n: Nombre de réponses candidates à générer en une seule requête
+                  (le préfixe du prompt est partagé côté serveur)
+        :param guided_choice: Liste de réponses autorisées (décodage contraint VLLM)
+        :param guided_regex: Expression régulière que la réponse doit respecter (décodage contraint VLLM)
+        :param stage: Étape appelante, pour le routage vers un modèle / serveur dédié (voir VLLM_STAGES)
+        :param priority: Classe de priorité pour l'admission (PRIORITY_INTERACTIVE ou PRIORITY_BATCH)
+        :param image_sources: Liste de tuples (fonction produisant les octets de l'image, mime_type).
+                              Les images sont lues et encodées au fil de l'envoi (corps en flux).
+        :param history: Messages précédents de la conversation (liste de dicts role / content),
+                        insérés entre le prompt système et le prompt : le début de la
+                        conversation reste identique et profite du cache de préfixes
+        :return: dict avec 'success' (bool), 'response' (str), 'responses' (list de str,
+                 une par candidat), 'error' (str) si erreur, 'queue_wait' (temps d'attente
+                 en file d'admission, en secondes), 'usage' (tokens consommés, format OpenAI)
+                 et 'duration' (durée de l'appel, en secondes)
         """
-        config = self._get_vllm_config()
+        request = self._prepare_request(
+            prompt, system_prompt=system_prompt, images_b64=images_b64, model=model,
+            temperature=temperature, max_tokens=max_tokens, n=n,
+            guided_choice=guided_choice, guided_regex=guided_regex, stage=stage,
+            priority=priority, image_sources=image_sources, history=history,
+        )
+        return self._execute_request(request)
+
+    @api.model
+    def _prepare_request(self, prompt, system_prompt=None, images_b64=None, model=None, temperature=None, max_tokens=None, n=None,
+                         guided_choice=None, guided_regex=None, stage=None, priority=PRIORITY_INTERACTIVE,
+                         image_sources=None, history=None):
+        """Construit la requête VLLM (endpoint, en-têtes, payload, limites d'admission).
+
+        Tout ce qui dépend de l'environnement Odoo est lu ici, afin que la requête puisse
+        ensuite être exécutée dans un autre thread (voir vllm_send_prompts).
+        Paramètres : voir vllm_send_prompt.
+
+        :return: dict de requête, ou dict avec 'error' si la configuration est incomplète
+        """
+        config = self._get_vllm_config(stage=stage)
 
         url = config['url']
         if not url:
-            return {'success': False, 'response': '', 'error': "L'URL du serveur VLLM n'est pas configurée dans la fiche société."}
+            return {'error': "L'URL du serveur VLLM n'est pas configurée dans la fiche société."}
 
         # Construire l'URL de l'endpoint
         if not url.endswith('/'):
@@ -85,9 +274,16 @@ class IsVllm(models.AbstractModel):
         messages = []
         if system_prompt:
             messages.append({'role': 'system', 'content': system_prompt})
+        messages.extend(history or [])
 
         # Si des images sont fournies, utiliser le format vision (multimodal)
-        if images_b64:
+        if image_sources:
+            # Les images seront insérées à la place du marqueur lors de l'envoi en flux
+            messages.append({'role': 'user', 'content': [
+                {'type': 'text', 'text': prompt},
+                STREAM_IMAGES_PLACEHOLDER,
+            ]})
+        elif images_b64:
             content_parts = []
             content_parts.append({'type': 'text', 'text': prompt})
             for img_b64, mime_type in images_b64:
@@ -108,6 +304,14 @@ class IsVllm(models.AbstractModel):
             'temperature':  temperature if temperature is not None else config['temperature'],
             'max_tokens':   max_tokens if max_tokens is not None else config['max_tokens'],
         }
+        if n and n > 1:
+            payload['n'] = n
+        # Décodage contraint (paramètres spécifiques à VLLM, ignorés si désactivé)
+        if config['guided_decoding']:
+            if guided_choice:
+                payload['guided_choice'] = list(guided_choice)
+            elif guided_regex:
+                payload['guided_regex'] = guided_regex
 
         headers = {
             'Content-Type': 'application/json',
@@ -115,37 +319,337 @@ class IsVllm(models.AbstractModel):
         if config['api_key']:
             headers['Authorization'] = 'Bearer %s' % config['api_key']
 
+        return {
+            'endpoint':      endpoint,
+            'headers':       headers,
+            'payload':       payload,
+            'image_sources': image_sources,
+            'admission':     self._get_admission_limits(priority=priority),
+        }
+
+    @api.model
+    def _execute_request(self, request, session=None):
+        """Envoie une requête préparée par _prepare_request et interprète la réponse.
+
+        N'utilise ni le curseur ni l'environnement de la requête Odoo : peut être appelée
+        depuis un thread.
+
+        :param session: Session HTTP à utiliser (connexions réutilisées), sinon session du worker
+        :return: dict de résultat (voir vllm_send_prompt) avec en plus 'duration' (s)
+        """
+        start = time.time()
+        if request.get('error'):
+            return {'success': False, 'response': '', 'responses': [], 'error': request['error'],
+                    'queue_wait': 0.0, 'usage': {}, 'duration': 0.0}
+        session = session or _get_http_session()
+        endpoint = request['endpoint']
+        payload = request['payload']
+        image_sources = request['image_sources']
+        admission = request['admission']
+        queue_wait = 0.0
         try:
-            _logger.info("VLLM - Envoi du prompt vers %s", endpoint)
-            response = requests.post(
-                endpoint,
-                headers=headers,
-                data=json.dumps(payload),
-                timeout=120,
-            )
+            with self._vllm_admission(admission) as queue_wait:
+                _logger.info("VLLM - Envoi du prompt vers %s (attente file %.2fs)", endpoint, queue_wait)
+                if image_sources:
+                    data = self._iter_request_body(payload, image_sources)
+                else:
+                    data = json.dumps(payload)
+                response = session.post(
+                    endpoint,
+                    headers=request['headers'],
+                    data=data,
+                    timeout=120,
+                )
             response.raise_for_status()
             result = response.json()
 
             # Extraire le contenu de la réponse (format OpenAI)
             if 'choices' in result and len(result['choices']) > 0:
-                content = result['choices'][0].get('message', {}).get('content', '')
-                return {'success': True, 'response': content, 'error': ''}
+                choices = sorted(result['choices'], key=lambda c: c.get('index', 0))
+                contents = [c.get('message', {}).get('content', '') or '' for c in choices]
+                return {'success': True, 'response': contents[0], 'responses': contents, 'error': '',
+                        'queue_wait': queue_wait, 'usage': result.get('usage') or {},
+                        'duration': time.time() - start}
             else:
-                return {'success': False, 'response': '', 'error': "Réponse VLLM inattendue : pas de 'choices' dans la réponse."}
+                msg = "Réponse VLLM inattendue : pas de 'choices' dans la réponse."
 
+        except UserError as e:
+            msg = str(e)
+            _logger.warning(msg)
         except requests.exceptions.ConnectionError as e:
             msg = "Impossible de se connecter au serveur VLLM (%s) : %s" % (endpoint, str(e))
             _logger.error(msg)
-            return {'success': False, 'response': '', 'error': msg}
         except requests.exceptions.Timeout:
             msg = "Timeout lors de la connexion au serveur VLLM (%s)" % endpoint
             _logger.error(msg)
-            return {'success': False, 'response': '', 'error': msg}
         except requests.exceptions.HTTPError as e:
             msg = "Erreur HTTP du serveur VLLM : %s" % str(e)
             _logger.error(msg)
-            return {'success': False, 'response': '', 'error': msg}
         except Exception as e:
             msg = "Erreur inattendue lors de la communication avec VLLM : %s" % str(e)
             _logger.error(msg)
-            return {'success': False, 'response': '', 'error': msg}
+        return {'success': False, 'response': '', 'responses': [], 'error': msg, 'queue_wait': queue_wait,
+                'usage': {}, 'duration': time.time() - start}
+
+    @api.model
+    def vllm_send_prompts(self, specs, max_workers=None):
+        """Envoie plusieurs prompts en parallèle et retourne les résultats dans l'ordre.
+
+        Les requêtes sont préparées dans le thread courant puis exécutées par un pool de
+        threads partageant une même session HTTP, ce qui permet au serveur VLLM de les
+        traiter ensemble (continuous batching). Le contrôle d'admission s'applique à
+        chaque requête. Une erreur sur une requête n'interrompt pas les autres.
+
+        :param specs: liste de dicts de paramètres de vllm_send_prompt (prompt, system_prompt, stage...)
+        :param max_workers: Nombre max de requêtes simultanées (défaut : paramètre société)
+        :return: liste de dicts de résultat (voir vllm_send_prompt), avec 'duration' (s) pour chacun
+        """
+        if not specs:
+            return []
+        requests_ = [self._prepare_request(**spec) for spec in specs]
+        if len(requests_) == 1:
+            return [self._execute_request(requests_[0])]
+        max_workers = min(max_workers or self.env.company.is_vllm_batch_concurrency or 1, len(requests_))
+        session = _get_http_session()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(lambda request: self._execute_request(request, session=session), requests_))
+
+    # ------------------------------------------------------------------
+    # Contrôle d'admission partagé entre les workers
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _get_admission_limits(self, priority=PRIORITY_INTERACTIVE):
+        """Retourne les limites de concurrence applicables à l'utilisateur courant.
+
+        Les requêtes batch ne peuvent pas utiliser les créneaux réservés à l'interactif.
+        Ces limites sont lues ici (dans le thread de la requête) pour que l'admission
+        n'utilise ensuite que le registre.
+        """
+        company = self.env.company
+        company_limit = company.is_vllm_max_concurrent
+        if priority == PRIORITY_BATCH and company_limit:
+            company_limit = max(company_limit - company.is_vllm_interactive_reserved, 1)
+        return {
+            'registry': self.env.registry,
+            'priority': priority,
+            'timeout':  company.is_vllm_queue_timeout,
+            'scopes':   [
+                ('user:%s' % self.env.uid, company.is_vllm_max_concurrent_user),
+                ('company:%s' % company.id, company_limit),
+            ],
+        }
+
+    @api.model
+    @contextmanager
+    def _vllm_admission(self, admission):
+        """Réserve un créneau d'envoi vers VLLM, partagé entre tous les workers Odoo.
+
+        Chaque créneau est un verrou consultatif PostgreSQL de session, pris sur un curseur
+        dédié (donc indépendant de la transaction en cours) et libéré à la sortie du bloc.
+        Produit le temps d'attente en file (s).
+        """
+        scopes = [(scope, limit) for scope, limit in admission['scopes'] if limit > 0]
+        if not scopes:
+            yield 0.0
+            return
+        start = time.time()
+        cr = admission['registry'].cursor()
+        try:
+            self._admission_wait(cr, scopes, admission, start)
+            queue_wait = time.time() - start
+            if queue_wait > 1:
+                _logger.info("VLLM - Attente en file d'admission : %.2fs (%s)", queue_wait, admission['priority'])
+            yield queue_wait
+        finally:
+            try:
+                cr.execute("SELECT pg_advisory_unlock_all()")
+                cr.commit()
+            finally:
+                cr.close()
+
+    @api.model
+    def _admission_wait(self, cr, scopes, admission, start):
+        """Attend qu'un créneau soit libre pour chaque périmètre (utilisateur, société)."""
+        priority = admission['priority']
+        interactive = priority != PRIORITY_BATCH
+        if interactive:
+            # Signale aux requêtes batch qu'une requête interactive attend
+            cr.execute("SELECT pg_advisory_lock_shared(hashtext(%s))", [ADMISSION_WAITING_KEY])
+        try:
+            while True:
+                if interactive or self._admission_no_interactive_waiting(cr):
+                    if self._admission_try_acquire(cr, scopes):
+                        return
+                cr.commit()
+                if time.time() - start > admission['timeout']:
+                    raise UserError(
+                        "Serveur VLLM saturé : aucun créneau libre après %s secondes d'attente." % admission['timeout']
+                    )
+                time.sleep(ADMISSION_POLL_INTERVAL.get(priority, ADMISSION_POLL_INTERVAL[PRIORITY_BATCH]))
+        finally:
+            if interactive:
+                cr.execute("SELECT pg_advisory_unlock_shared(hashtext(%s))", [ADMISSION_WAITING_KEY])
+            cr.commit()
+
+    @api.model
+    def _admission_no_interactive_waiting(self, cr):
+        """Vrai si aucune requête interactive n'attend (verrou exclusif obtenable)."""
+        cr.execute("SELECT pg_try_advisory_lock(hashtext(%s))", [ADMISSION_WAITING_KEY])
+        if not cr.fetchone()[0]:
+            return False
+        cr.execute("SELECT pg_advisory_unlock(hashtext(%s))", [ADMISSION_WAITING_KEY])
+        return True
+
+    @api.model
+    def _admission_try_acquire(self, cr, scopes):
+        """Tente de prendre un créneau dans chaque périmètre, tout ou rien."""
+        acquired = []
+        for scope, limit in scopes:
+            for slot in range(limit):
+                key = 'is_vllm:%s:%s' % (scope, slot)
+                cr.execute("SELECT pg_try_advisory_lock(hashtext(%s))", [key])
+                if cr.fetchone()[0]:
+                    acquired.append(key)
+                    break
+            else:
+                for key in acquired:
+                    cr.execute("SELECT pg_advisory_unlock(hashtext(%s))", [key])
+                return False
+        return True
+
+    # ------------------------------------------------------------------
+    # Découverte des capacités du serveur et préchauffage
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _vllm_list_models(self, config):
+        """Interroge /v1/models et retourne la liste des modèles servis (format OpenAI)."""
+        url = config['url']
+        if not url.endswith('/'):
+            url += '/'
+        headers = {}
+        if config['api_key']:
+            headers['Authorization'] = 'Bearer %s' % config['api_key']
+        response = requests.get(url + 'v1/models', headers=headers, timeout=10)
+        response.raise_for_status()
+        return response.json().get('data', [])
+
+    @api.model
+    def vllm_count_tokens(self, text, stage=None):
+        """Compte les tokens d'un texte avec le tokenizer du modèle (endpoint /tokenize de VLLM).
+
+        :return: nombre de tokens, ou None si le serveur ne répond pas
+        """
+        config = self._get_vllm_config(stage=stage)
+        url = config['url']
+        if not url:
+            return None
+        if not url.endswith('/'):
+            url += '/'
+        headers = {'Content-Type': 'application/json'}
+        if config['api_key']:
+            headers['Authorization'] = 'Bearer %s' % config['api_key']
+        try:
+            response = _get_http_session().post(
+                url + 'tokenize',
+                headers=headers,
+                data=json.dumps({'model': config['model'], 'prompt': text}),
+                timeout=30,
+            )
+            response.raise_for_status()
+            return response.json().get('count')
+        except Exception as e:
+            _logger.warning("VLLM - Comptage des tokens impossible : %s", str(e))
+            return None
+
+    @api.model
+    def _get_warmup_prompts(self):
+        """Retourne les préfixes statiques à envoyer lors du préchauffage.
+
+        A surcharger par les modules utilisant VLLM.
+
+        :return: liste de tuples (libellé, étape, system_prompt, prompt)
+        """
+        return []
+
+    @api.model
+    def vllm_warmup(self):
+        """Vérifie la configuration VLLM de la société et préchauffe le cache de préfixes.
+
+        Pour chaque couple (serveur, modèle) configuré, /v1/models est interrogé pour
+        vérifier que le modèle est servi et récupérer sa longueur de contexte (max_model_len).
+        Les prompts statiques (system prompts, catalogue des modèles) sont ensuite envoyés
+        une fois avec max_tokens=1 pour que le cache de préfixes du serveur soit chaud.
+        Le rapport et la longueur de contexte sont enregistrés sur la fiche société.
+
+        :return: rapport texte
+        """
+        company = self.env.company
+        lines = []
+        max_model_len = {}
+        failed = set()
+        for stage in (None,) + VLLM_STAGES:
+            config = self._get_vllm_config(stage=stage)
+            key = (config['url'], config['model'])
+            if not config['url'] or key in max_model_len:
+                continue
+            max_model_len[key] = 0
+            start = time.time()
+            try:
+                served = {m.get('id'): m for m in self._vllm_list_models(config)}
+            except Exception as e:
+                lines.append("ERREUR %s : serveur injoignable (%s)" % (config['url'], str(e)))
+                failed.add(key)
+                continue
+            elapsed = time.time() - start
+            if config['model'] not in served:
+                lines.append("ERREUR %s : modèle '%s' non servi (disponibles : %s)" % (
+                    config['url'], config['model'], ', '.join(sorted(filter(None, served))) or '-'))
+                failed.add(key)
+                continue
+            max_model_len[key] = served[config['model']].get('max_model_len') or 0
+            lines.append("OK %s : %s (max_model_len=%s) en %.2fs" % (
+                config['url'], config['model'], max_model_len[key] or '?', elapsed))
+
+        for label, stage, system_prompt, prompt in self._get_warmup_prompts():
+            config = self._get_vllm_config(stage=stage)
+            key = (config['url'], config['model'])
+            if key in failed:
+                # Serveur ou modèle en erreur : inutile de préchauffer
+                continue
+            context_len = max_model_len.get(key)
+            start = time.time()
+            result = self.vllm_send_prompt(
+                prompt, system_prompt=system_prompt, stage=stage,
+                temperature=0, max_tokens=1, priority=PRIORITY_BATCH,
+            )
+            elapsed = time.time() - start
+            if not result['success']:
+                lines.append("ERREUR préchauffage %s : %s" % (label, result['error']))
+                continue
+            prompt_tokens = result['usage'].get('prompt_tokens') or 0
+            line = "Préchauffage %s : %s tokens en %.2fs" % (label, prompt_tokens or '?', elapsed)
+            if context_len and prompt_tokens > context_len * 0.9:
+                line += " - ATTENTION : proche de la limite de contexte (%s)" % context_len
+            lines.append(line)
+
+        report = '\n'.join(lines) or "Aucun serveur VLLM configuré."
+        _logger.info("VLLM - Préchauffage société %s :\n%s", company.name, report)
+        # res.company.write vide les caches du registre (ormcache de tous les workers) :
+        # seule une nouvelle longueur de contexte passe par l'ORM ; la date et le rapport,
+        # qui changent à chaque préchauffage, sont enregistrés directement
+        context_len = max_model_len.get((company.is_vllm_url or '', company.is_vllm_model or ''), 0)
+        if company.is_vllm_max_model_len != context_len:
+            company.sudo().write({'is_vllm_max_model_len': context_len})
+        self.env.cr.execute("""
+            UPDATE res_company SET is_vllm_warmup_date = %s, is_vllm_warmup_report = %s WHERE id = %s
+        """, (fields.Datetime.now(), report, company.id))
+        company.invalidate_recordset(['is_vllm_warmup_date', 'is_vllm_warmup_report'])
+        return report
+
+    @api.model
+    def _cron_vllm_warmup(self):
+        """Tâche planifiée : préchauffage des serveurs VLLM de chaque société configurée."""
+        for company in self.env['res.company'].search([('is_vllm_url', '!=', False)]):
+            self.with_company(company).vllm_warmup()
@@ -1,6 +1,10 @@
 # -*- coding: utf-8 -*-
 
-from odoo import fields, models
+from odoo import api, fields, models
+from odoo.exceptions import ValidationError
+
+FAST_PATH_REPORT_DAYS = 30
+DOMAIN_CANDIDATES_MAX = 8
 
 
 class ResCompany(models.Model):
@@ -28,3 +32,234 @@ class ResCompany(models.Model):
         default=2048,
         help="Nombre maximum de tokens dans la réponse",
     )
+    is_vllm_domain_candidates = fields.Integer(
+        string='Domaines candidats',
+        default=1,
+        help="Nombre de domaines candidats demandés en une seule requête (paramètre n). "
+             "Ils sont validés et comptés en parallèle, le premier valide et non vide est retenu "
+             "(de 1 à %s)." % DOMAIN_CANDIDATES_MAX,
+    )
+    is_vllm_guided_decoding = fields.Boolean(
+        string='Décodage contraint',
+        default=True,
+        help="Utilise guided_choice / guided_regex de VLLM pour les étapes à réponse courte "
+             "(modèle, type de vue, regroupement). Désactiver si le serveur ne les supporte pas.",
+    )
+    is_vllm_schema_format = fields.Selection(
+        [
+            ('compact', 'Compact'),
+            ('verbose', 'Détaillé'),
+        ],
+        string='Format du schéma',
+        default='compact',
+        help="Format de description des champs du modèle dans les prompts. "
+             "Compact : regroupé par type, sans les champs techniques des mixins (moins de tokens). "
+             "Détaillé : une ligne par champ.",
+    )
+    is_vllm_aggregate_ttl = fields.Integer(
+        string='Validité de la synthèse (min)',
+        default=60,
+        help="Durée pendant laquelle la synthèse pré-calculée (read_group) des recherches "
+             "graphique / tableau croisé est réutilisée sans être recalculée.",
+    )
+    is_vllm_preview_size = fields.Integer(
+        string='Aperçu (nb d\'enregistrements)',
+        default=5,
+        help="Nombre d'enregistrements affichés dans l'aperçu de la recherche générale. "
+             "0 = pas d'aperçu.",
+    )
+    is_vllm_repair_attempts = fields.Integer(
+        string='Corrections du domaine max.',
+        default=2,
+        help="Nombre maximum de fois où un domaine refusé (syntaxe, champ inexistant...) est "
+             "renvoyé à VLLM avec l'erreur pour correction. 0 = pas de correction automatique.",
+    )
+    is_vllm_repair_budget = fields.Integer(
+        string='Budget de correction (s)',
+        default=20,
+        help="Aucune nouvelle tentative de correction n'est lancée au-delà de cette durée.",
+    )
+    is_vllm_fast_path = fields.Boolean(
+        string='Analyse locale des recherches simples',
+        default=True,
+        help="Les recherches simples (ex: 'factures de ce mois', 'devis en brouillon') sont "
+             "traduites en domaine localement, sans appel à VLLM, lorsque toute la question "
+             "est reconnue.",
+    )
+    is_vllm_fast_path_report = fields.Html(
+        string='Bilan de l\'analyse locale',
+        compute='_compute_is_vllm_fast_path_report',
+        sanitize=False,
+    )
+    is_vllm_prefetch = fields.Boolean(
+        string='Identification anticipée du modèle',
+        default=True,
+        help="L'identification du modèle est lancée en arrière-plan dès que la question est "
+             "saisie, avant le clic sur Rechercher.",
+    )
+    is_vllm_prefetch_wait = fields.Integer(
+        string='Attente max. de l\'identification anticipée (s)',
+        default=10,
+        help="Au lancement de la recherche, durée maximale d'attente d'une identification "
+             "anticipée encore en cours avant de relancer l'identification.",
+    )
+    is_vllm_pdf_mode = fields.Selection(
+        [
+            ('text',   'Texte (images pour les pages sans texte)'),
+            ('images', 'Images (toutes les pages)'),
+        ],
+        string='Envoi des PDF (chat)',
+        default='text',
+        help="Texte : la couche texte des PDF numériques est extraite localement et envoyée "
+             "dans le prompt ; seules les pages sans texte (scans) sont envoyées en images, "
+             "ainsi que tout le PDF si la question porte sur l'aspect visuel (logo, signature, "
+             "plan...). Images : chaque page est rendue en image (200 DPI).",
+    )
+    is_vllm_catalog_pruning = fields.Boolean(
+        string='Catalogue des modèles élagué',
+        default=True,
+        help="Ne proposer à VLLM que les modèles dont la table n'est pas vide, les plus "
+             "recherchés en premier (statistiques actualisées chaque nuit, menu IA / "
+             "Catalogue des modèles). Le catalogue est le même pour tous les utilisateurs ; "
+             "les droits d'accès sont contrôlés sur le modèle identifié.",
+    )
+    is_vllm_catalog_min_rows = fields.Integer(
+        string='Lignes min. (catalogue)',
+        default=1,
+        help="Nombre minimum de lignes estimé pour qu'un modèle soit proposé à VLLM.",
+    )
+
+    # Routage par étape : modèle et serveur dédiés (vides = configuration par défaut)
+    is_vllm_identification_url = fields.Char(
+        string='URL (identification du modèle)',
+        help="Serveur VLLM pour l'identification du modèle Odoo. Vide = URL par défaut.",
+    )
+    is_vllm_identification_model = fields.Char(
+        string='Modèle (identification du modèle)',
+        help="Modèle pour l'identification du modèle Odoo. Vide = modèle par défaut.",
+    )
+    is_vllm_domain_url = fields.Char(
+        string='URL (domaine)',
+        help="Serveur VLLM pour la génération du domaine. Vide = URL par défaut.",
+    )
+    is_vllm_domain_model = fields.Char(
+        string='Modèle (domaine)',
+        help="Modèle pour la génération du domaine. Vide = modèle par défaut.",
+    )
+    is_vllm_view_type_url = fields.Char(
+        string='URL (type de vue)',
+        help="Serveur VLLM pour le choix du type de vue. Vide = URL par défaut.",
+    )
+    is_vllm_view_type_model = fields.Char(
+        string='Modèle (type de vue)',
+        help="Modèle pour le choix du type de vue. Vide = modèle par défaut.",
+    )
+    is_vllm_group_by_url = fields.Char(
+        string='URL (regroupement)',
+        help="Serveur VLLM pour le choix du regroupement. Vide = URL par défaut.",
+    )
+    is_vllm_group_by_model = fields.Char(
+        string='Modèle (regroupement)',
+        help="Modèle pour le choix du regroupement. Vide = modèle par défaut.",
+    )
+    is_vllm_chat_url = fields.Char(
+        string='URL (chat)',
+        help="Serveur VLLM pour le chat. Vide = URL par défaut.",
+    )
+    is_vllm_chat_model = fields.Char(
+        string='Modèle (chat)',
+        help="Modèle pour le chat. Vide = modèle par défaut.",
+    )
+
+    # Contrôle d'admission (partagé entre les workers via des verrous PostgreSQL)
+    is_vllm_max_concurrent = fields.Integer(
+        string='Requêtes simultanées max (société)',
+        default=0,
+        help="Nombre maximum de requêtes VLLM simultanées pour la société, tous workers confondus. "
+             "0 = illimité.",
+    )
+    is_vllm_max_concurrent_user = fields.Integer(
+        string='Requêtes simultanées max (utilisateur)',
+        default=0,
+        help="Nombre maximum de requêtes VLLM simultanées par utilisateur. 0 = illimité.",
+    )
+    is_vllm_interactive_reserved = fields.Integer(
+        string='Créneaux réservés à l\'interactif',
+        default=1,
+        help="Nombre de créneaux de la société que les traitements batch (tâches planifiées) "
+             "ne peuvent pas utiliser, afin de garder la recherche et le chat réactifs.",
+    )
+    is_vllm_batch_concurrency = fields.Integer(
+        string='Requêtes parallèles par lot',
+        default=8,
+        help="Nombre maximum de requêtes envoyées simultanément par un même appel "
+             "groupé (vllm_send_prompts).",
+    )
+    is_vllm_queue_timeout = fields.Integer(
+        string='Attente max en file (s)',
+        default=60,
+        help="Durée maximale d'attente d'un créneau libre avant d'abandonner la requête.",
+    )
+
+    # Découverte des capacités du serveur (renseigné par le préchauffage)
+    is_vllm_max_model_len = fields.Integer(
+        string='Longueur de contexte',
+        readonly=True,
+        help="max_model_len du modèle par défaut, tel que retourné par /v1/models.",
+    )
+    is_vllm_warmup_date = fields.Datetime(
+        string='Dernier préchauffage',
+        readonly=True,
+    )
+    is_vllm_warmup_report = fields.Text(
+        string='Rapport de préchauffage',
+        readonly=True,
+    )
+
+    @api.constrains('is_vllm_domain_candidates')
+    def _check_is_vllm_domain_candidates(self):
+        for company in self:
+            if not 1 <= company.is_vllm_domain_candidates <= DOMAIN_CANDIDATES_MAX:
+                raise ValidationError(
+                    "Le nombre de domaines candidats doit être compris entre 1 et %s." % DOMAIN_CANDIDATES_MAX
+                )
+
+    def _compute_is_vllm_fast_path_report(self):
+        """Part des recherches traitées localement et temps gagné sur les derniers jours."""
+        since = fields.Datetime.subtract(fields.Datetime.now(), days=FAST_PATH_REPORT_DAYS)
+        groups = self.env['is.search.general'].sudo().read_group(
+            [('temps_reponse', '>', 0), ('write_date', '>=', since)],
+            ['temps_reponse:avg'], ['fast_path'], lazy=False,
+        )
+        stats = {bool(g['fast_path']): (g['__count'], g['temps_reponse'] or 0.0) for g in groups}
+        nb_local, avg_local = stats.get(True, (0, 0.0))
+        nb_vllm, avg_vllm = stats.get(False, (0, 0.0))
+        total = nb_local + nb_vllm
+        if not total:
+            report = "<p>Aucune recherche sur les %s derniers jours.</p>" % FAST_PATH_REPORT_DAYS
+        else:
+            saved = nb_local * max(avg_vllm - avg_local, 0.0) if nb_vllm else 0.0
+            report = (
+                "<p>%s derniers jours : <b>%s / %s</b> recherches traitées localement (%.0f %%).</p>"
+                "<p>Temps de réponse moyen : %.2f s en local, %.2f s avec VLLM ; "
+                "temps gagné estimé : <b>%.0f s</b>.</p>"
+            ) % (FAST_PATH_REPORT_DAYS, nb_local, total, 100.0 * nb_local / total,
+                 avg_local, avg_vllm, saved)
+        for company in self:
+            company.is_vllm_fast_path_report = report
+
+    def action_vllm_warmup(self):
+        """Vérifie la configuration VLLM et préchauffe le cache de préfixes du serveur."""
+        self.ensure_one()
+        report = self.env['is.vllm'].with_company(self).vllm_warmup()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': 'Préchauffage VLLM',
+                'message': report,
+                'type': 'danger' if 'ERREUR' in report else 'success',
+                'sticky': 'ERREUR' in report,
+                'next': {'type': 'ir.actions.client', 'tag': 'soft_reload'},
+            },
+        }
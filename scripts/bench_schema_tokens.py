@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""Benchmark du format de description des champs dans les prompts (détaillé / compact).
+
+A lancer dans un shell Odoo sur la base à mesurer :
+
+    odoo-bin shell -d <base> < scripts/bench_schema_tokens.py
+
+Variables d'environnement :
+
+    BENCH_MODELS     Modèles à mesurer, séparés par des virgules
+                     (défaut : les BENCH_TOP modèles ayant le plus de champs stockés)
+    BENCH_TOP        Nombre de modèles mesurés par défaut (défaut : 15)
+    BENCH_QUESTIONS  Fichier JSON de questions de référence, pour comparer la précision
+                     des domaines générés avec chaque format :
+                     [{"question": "...", "model": "account.move", "domain": "[...]"}, ...]
+
+Les tokens sont comptés par le serveur VLLM (/tokenize), à défaut estimés (caractères / 4).
+Aucune donnée n'est enregistrée : la transaction est annulée à la fin.
+"""
+
+import json
+import os
+
+from odoo.tools.safe_eval import safe_eval, datetime
+
+FORMATS = ('verbose', 'compact')
+
+
+def count_tokens(env, text):
+    count = env['is.vllm'].vllm_count_tokens(text, stage='domain')
+    return count if count is not None else len(text) // 4
+
+
+def largest_models(env, top):
+    sizes = []
+    for model_name in env.registry.models:
+        model = env[model_name]
+        if model._abstract or model._transient or model._table_query:
+            continue
+        sizes.append((sum(1 for f in model._fields.values() if f.store), model_name))
+    return [name for _size, name in sorted(sizes, reverse=True)[:top]]
+
+
+def bench_tokens(env, model_names):
+    search = env['is.search.general']
+    totals = dict.fromkeys(FORMATS, 0)
+    print("%-40s %10s %10s %8s" % ('Modèle', 'Détaillé', 'Compact', 'Gain'))
+    for model_name in model_names:
+        counts = {
+            fmt: count_tokens(env, search._get_model_fields_description(model_name, schema_format=fmt))
+            for fmt in FORMATS
+        }
+        for fmt in FORMATS:
+            totals[fmt] += counts[fmt]
+        gain = 100.0 * (1 - counts['compact'] / counts['verbose']) if counts['verbose'] else 0
+        print("%-40s %10s %10s %7.1f%%" % (model_name, counts['verbose'], counts['compact'], gain))
+    gain = 100.0 * (1 - totals['compact'] / totals['verbose']) if totals['verbose'] else 0
+    print("%-40s %10s %10s %7.1f%%" % ('TOTAL', totals['verbose'], totals['compact'], gain))
+
+
+def result_ids(env, model_name, domain_str):
+    search = env['is.search.general']
+    domain = search._validate_domain(domain_str)
+    if not domain['valid']:
+        return None
+    try:
+        return set(env[model_name].sudo().search(safe_eval(domain_str, {
+            'datetime': datetime,
+            'context_today': datetime.datetime.now,
+        })).ids)
+    except Exception:
+        return None
+
+
+def bench_accuracy(env, questions):
+    print("\nPrécision des domaines (%s questions)" % len(questions))
+    for fmt in FORMATS:
+        env.company.is_vllm_schema_format = fmt
+        ok = 0
+        for item in questions:
+            expected = result_ids(env, item['model'], item['domain'])
+            record = env['is.search.general'].new({'question': item['question']})
+            result = record._ask_vllm_for_domain(item['model'])
+            got = None
+            if result['success']:
+                domain_str = record._extract_text_from_response(result['response'], marker='[')
+                got = result_ids(env, item['model'], domain_str) if domain_str else None
+            ok += int(got is not None and got == expected)
+        print("%-10s %s / %s (%.1f%%)" % (fmt, ok, len(questions), 100.0 * ok / len(questions)))
+
+
+def main(env):
+    model_names = [m.strip() for m in os.environ.get('BENCH_MODELS', '').split(',') if m.strip()]
+    model_names = model_names or largest_models(env, int(os.environ.get('BENCH_TOP', 15)))
+    bench_tokens(env, model_names)
+    questions_file = os.environ.get('BENCH_QUESTIONS')
+    if questions_file:
+        with open(questions_file) as f:
+            bench_accuracy(env, json.load(f))
+    env.cr.rollback()
+
+
+main(env)  # noqa: F821 (variable fournie par odoo-bin shell)
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""Évaluation comparative (A/B) des serveurs / modèles VLLM sur la recherche générale.
+
+Un jeu de questions étiquetées est passé dans le pipeline complet (action_search) pour
+chaque cible ; sont comparés : précision du modèle identifié, précision du domaine
+(mêmes enregistrements que le domaine attendu), nombre de résultats, tokens consommés
+et latences. A lancer dans un shell Odoo :
+
+    odoo-bin shell -d <base> < scripts/eval_models.py
+
+Variables d'environnement :
+
+    EVAL_QUESTIONS   Fichier JSON des questions étiquetées (obligatoire) :
+                     [{"question": "...", "model": "account.move", "domain": "[...]"}, ...]
+    EVAL_TARGETS     Fichier JSON des cibles à comparer (défaut : configuration de la société) :
+                     [{"name": "qwen-awq", "url": "http://gpu1:8000", "model": "Qwen/...-AWQ"},
+                      {"name": "stub", "stub": {"service_time": 0.3, "replay": "rec.json"}}, ...]
+                     Une cible "stub" démarre le serveur factice (scripts/vllm_stub.py) dans
+                     le processus ; avec "replay", il rejoue des réponses enregistrées
+                     (les questions sans réponse enregistrée sont signalées dans le rapport).
+    EVAL_RECORD      Fichier où enregistrer les réponses reçues, rejouables ensuite par
+                     une cible "stub" (ou python3 scripts/vllm_stub.py --replay <fichier>)
+    EVAL_REPORT      Fichier du rapport JSON détaillé (défaut : eval_report.json)
+    EVAL_FAST_PATH   1 pour activer l'analyse locale des recherches simples (défaut : 0, toutes
+                     les questions passent par VLLM et comparent réellement les cibles)
+
+La configuration de la société n'est pas modifiée : chaque cible est appliquée par la
+clé de contexte 'vllm_config_override'. Aucune donnée n'est enregistrée dans la base.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+from odoo.modules.module import get_module_path
+from odoo.tools.safe_eval import safe_eval, datetime
+
+sys.path.insert(0, os.path.join(get_module_path('is_vllm2odoo'), 'scripts'))
+import vllm_stub  # noqa: E402
+
+
+class CallRecorder:
+    """Intercepte les appels VLLM : cumule les tokens et enregistre les réponses."""
+
+    def __init__(self, env):
+        self.cls = type(env['is.vllm'])
+        self.original = self.cls._execute_request
+        self.lock = threading.Lock()
+        self.recorded = {}
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.calls = 0
+            self.prompt_tokens = 0
+            self.completion_tokens = 0
+
+    def __enter__(self):
+        recorder = self
+        original = self.original
+
+        def _execute_request(self, request, session=None):
+            result = original(self, request, session=session)
+            usage = result.get('usage') or {}
+            with recorder.lock:
+                recorder.calls += 1
+                recorder.prompt_tokens += usage.get('prompt_tokens') or 0
+                recorder.completion_tokens += usage.get('completion_tokens') or 0
+                if result.get('success') and 'payload' in request:
+                    key = vllm_stub.request_key(request['payload'])
+                    recorder.recorded[key] = result.get('responses') or [result['response']]
+            return result
+
+        self.cls._execute_request = _execute_request
+        return self
+
+    def __exit__(self, *exc):
+        self.cls._execute_request = self.original
+
+
+def start_target(target):
+    """Démarre le serveur factice d'une cible 'stub' et retourne (config, serveur)."""
+    config = {k: target[k] for k in ('url', 'model', 'api_key') if k in target}
+    stub = target.get('stub')
+    if stub is None:
+        return config, None
+    replay = None
+    if stub.get('replay'):
+        with open(stub['replay']) as f:
+            replay = json.load(f)
+    model = target.get('model', 'stub-model')
+    server = vllm_stub.serve(
+        port=stub.get('port', 0), concurrency=stub.get('concurrency', 4),
+        service_time=stub.get('service_time', 0.0), distribution=stub.get('distribution', 'fixed'),
+        model=model, replay=replay,
+    )
+    config.update(url='http://127.0.0.1:%s' % server.server_address[1], model=model)
+    return config, server
+
+
+def result_ids(env, model_name, domain_str):
+    if not model_name or not domain_str or model_name not in env:
+        return None
+    try:
+        return set(env[model_name].sudo().search(safe_eval(domain_str, {
+            'datetime': datetime,
+            'context_today': datetime.datetime.now,
+        })).ids)
+    except Exception:
+        return None
+
+
+class _Rollback(Exception):
+    """Annule la recherche évaluée (savepoint) une fois ses résultats relevés."""
+
+
+def run_question(env, recorder, item, expected_ids):
+    recorder.reset()
+    row = {'question': item['question'], 'expected_model': item['model']}
+    start = time.time()
+    try:
+        with env.cr.savepoint():
+            search = env['is.search.general'].create({'question': item['question']})
+            search.action_search()
+            row.update(
+                model=search.model_name, domain=search.domain, count=search.nb_results,
+                fast_path=search.fast_path, repairs=search.domain_repairs,
+                timings={t.stage: t.duration for t in search.timing_ids},
+            )
+            got_ids = result_ids(env, search.model_name, search.domain)
+            raise _Rollback()
+    except _Rollback:
+        pass
+    except Exception as e:
+        row['error'] = str(e).split('\n')[0]
+        got_ids = None
+    row['latency'] = time.time() - start
+    row.update(
+        calls=recorder.calls, prompt_tokens=recorder.prompt_tokens,
+        completion_tokens=recorder.completion_tokens,
+        model_ok=row.get('model') == item['model'],
+        domain_ok=got_ids is not None and expected_ids is not None and got_ids == expected_ids,
+        count_ok=expected_ids is not None and row.get('count') == len(expected_ids),
+    )
+    return row
+
+
+def summarize(name, rows):
+    total = len(rows) or 1
+    latencies = [r['latency'] for r in rows if 'error' not in r]
+    return {
+        'target':            name,
+        'questions':         len(rows),
+        'errors':            sum(1 for r in rows if 'error' in r),
+        'model_accuracy':    sum(r['model_ok'] for r in rows) / total,
+        'domain_accuracy':   sum(r['domain_ok'] for r in rows) / total,
+        'count_match':       sum(r['count_ok'] for r in rows) / total,
+        'fast_path':         sum(1 for r in rows if r.get('fast_path')) / total,
+        'calls':             sum(r['calls'] for r in rows),
+        'prompt_tokens':     sum(r['prompt_tokens'] for r in rows),
+        'completion_tokens': sum(r['completion_tokens'] for r in rows),
+        'latency_p50':       vllm_stub.percentile(latencies, 50),
+        'latency_p95':       vllm_stub.percentile(latencies, 95),
+        'latency_p99':       vllm_stub.percentile(latencies, 99),
+    }
+
+
+def print_summary(summaries):
+    print("\n%-20s %5s %4s %7s %7s %7s %6s %10s %9s %6s %6s %6s" % (
+        'Cible', 'quest', 'err', 'modèle', 'domaine', 'nombre', 'appels',
+        'tok. entr.', 'tok. sort', 'p50', 'p95', 'p99'))
+    for s in summaries:
+        print("%-20s %5d %4d %6.0f%% %6.0f%% %6.0f%% %6d %10d %9d %6.2f %6.2f %6.2f" % (
+            s['target'][:20], s['questions'], s['errors'],
+            100 * s['model_accuracy'], 100 * s['domain_accuracy'], 100 * s['count_match'],
+            s['calls'], s['prompt_tokens'], s['completion_tokens'],
+            s['latency_p50'], s['latency_p95'], s['latency_p99'],
+        ))
+
+
+def main(env):
+    with open(os.environ['EVAL_QUESTIONS']) as f:
+        questions = json.load(f)
+    targets = [{'name': 'société'}]
+    if os.environ.get('EVAL_TARGETS'):
+        with open(os.environ['EVAL_TARGETS']) as f:
+            targets = json.load(f)
+    if os.environ.get('EVAL_FAST_PATH', '0') != '1':
+        env.company.is_vllm_fast_path = False
+    # Enregistrements attendus, communs à toutes les cibles
+    expected = [result_ids(env, item['model'], item['domain']) for item in questions]
+
+    report = {'questions': len(questions), 'targets': []}
+    summaries = []
+    with CallRecorder(env) as recorder:
+        for target in targets:
+            config, server = start_target(target)
+            target_env = env(context=dict(env.context, vllm_config_override=config))
+            print("Cible %s (%s)..." % (target['name'], config.get('model') or 'modèle société'))
+            try:
+                rows = [
+                    run_question(target_env, recorder, item, expected_ids)
+                    for item, expected_ids in zip(questions, expected)
+                ]
+            finally:
+                if server:
+                    server.shutdown()
+            summary = summarize(target['name'], rows)
+            if server and server.state.replay:
+                stats = server.state.stats()
+                summary.update(replay_hits=stats['replay_hits'], replay_misses=stats['replay_misses'])
+                if stats['replay_misses']:
+                    print("  ATTENTION : %s requête(s) sans réponse enregistrée (réponse déduite)" % (
+                        stats['replay_misses']))
+            summaries.append(summary)
+            report['targets'].append(dict(summary, details=rows))
+
+    print_summary(summaries)
+    report_file = os.environ.get('EVAL_REPORT', 'eval_report.json')
+    with open(report_file, 'w') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False, default=str)
+    print("\nRapport détaillé : %s" % report_file)
+    if os.environ.get('EVAL_RECORD'):
+        with open(os.environ['EVAL_RECORD'], 'w') as f:
+            json.dump(recorder.recorded, f, indent=2, ensure_ascii=False)
+        print("Réponses enregistrées : %s (%s)" % (os.environ['EVAL_RECORD'], len(recorder.recorded)))
+    env.cr.rollback()
+
+
+main(env)  # noqa: F821 (variable fournie par odoo-bin shell)
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""Test de charge de la recherche générale et du chat avec plusieurs utilisateurs simultanés.
+
+Démarrer d'abord le serveur VLLM factice (temps de service et concurrence réglables) :
+
+    python3 scripts/vllm_stub.py --port 8100 --service-time 0.8 --concurrency 4
+
+puis lancer le test dans un shell Odoo :
+
+    odoo-bin shell -d <base> < scripts/load_test.py
+
+Variables d'environnement :
+
+    LOAD_VLLM_URL    URL de base du serveur VLLM testé (défaut : http://127.0.0.1:8100)
+    LOAD_VLLM_MODEL  Modèle demandé (défaut : stub-model)
+    LOAD_USERS       Nombre d'utilisateurs simultanés, séparés par des virgules pour
+                     enchaîner plusieurs paliers (défaut : 1,2,4,8)
+    LOAD_ITERATIONS  Nombre de requêtes par utilisateur et par palier (défaut : 5)
+    LOAD_SCENARIO    search, chat ou mixed (défaut : search)
+    LOAD_QUESTIONS   Fichier JSON de questions ["...", ...] (défaut : questions intégrées)
+
+La configuration VLLM de la société n'est pas modifiée : l'URL et le modèle sont
+remplacés par la clé de contexte 'vllm_config_override'. Le contrôle d'admission
+(nombre de requêtes simultanées, réserve interactive) reste celui de la société.
+
+Pour chaque palier sont affichés : débit, latences p50/p95/p99, attente d'admission,
+puis, côté serveur factice, occupation des créneaux et attente en file. Aucune donnée n'est enregistrée : chaque requête est annulée.
+"""
+
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.request
+
+from odoo import api
+from odoo.modules.module import get_module_path
+
+sys.path.insert(0, os.path.join(get_module_path('is_vllm2odoo'), 'scripts'))
+import vllm_stub  # noqa: E402
+
+DEFAULT_QUESTIONS = [
+    "Liste des clients situés en France",
+    "Factures clients non payées",
+    "Commandes de vente du mois dernier",
+    "Contacts sans adresse email",
+    "Nombre de partenaires par pays",
+]
+
+
+def stub_call(url, path, data=None):
+    """Appelle un endpoint de statistiques du serveur factice (None si indisponible)."""
+    base = url.rstrip('/')
+    try:
+        request = urllib.request.Request(
+            base + path, data=json.dumps(data).encode() if data is not None else None,
+            headers={'Content-Type': 'application/json'},
+        )
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return json.load(response)
+    except Exception:
+        return None
+
+
+def run_search(env, question):
+    search = env['is.search.general'].create({'question': question})
+    search.action_search()
+    return search.temps_attente
+
+
+def run_chat(env, question):
+    chat = env['is.chat.vllm'].create({'question': question})
+    chat.action_send_question()
+    return chat.temps_attente
+
+
+def user_loop(registry, uid, context, scenario, questions, iterations, samples, lock):
+    """Un utilisateur : enchaîne les requêtes sans temps de réflexion."""
+    for _i in range(iterations):
+        kind = scenario if scenario != 'mixed' else random.choice(('search', 'chat'))
+        question = random.choice(questions)
+        start = time.time()
+        wait, error = 0.0, None
+        with registry.cursor() as cr:
+            user_env = api.Environment(cr, uid, context)
+            try:
+                wait = (run_search if kind == 'search' else run_chat)(user_env, question) or 0.0
+            except Exception as e:
+                error = str(e).split('\n')[0]
+            cr.rollback()
+        with lock:
+            samples.append({
+                'kind': kind, 'start': start, 'latency': time.time() - start,
+                'wait': wait, 'error': error,
+            })
+
+
+def run_level(env, users, iterations, scenario, questions, url, model):
+    context = dict(env.context, vllm_config_override={'url': url, 'model': model})
+    samples, lock = [], threading.Lock()
+    stub_call(url, '/stats/reset', {})
+    threads = [
+        threading.Thread(
+            target=user_loop,
+            args=(env.registry, env.uid, context, scenario, questions, iterations, samples, lock),
+        )
+        for _u in range(users)
+    ]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start
+    return samples, elapsed, stub_call(url, '/stats')
+
+
+def report(users, samples, elapsed, stub):
+    ok = [s for s in samples if not s['error']]
+    latencies = [s['latency'] for s in ok]
+    waits = [s['wait'] for s in ok]
+    print("%5d %6d %5d %8.2f %7.2f %7.2f %7.2f %7.2f" % (
+        users, len(samples), len(samples) - len(ok),
+        len(ok) / elapsed if elapsed else 0.0,
+        vllm_stub.percentile(latencies, 50), vllm_stub.percentile(latencies, 95),
+        vllm_stub.percentile(latencies, 99),
+        vllm_stub.percentile(waits, 95),
+    ), end='')
+    if stub:
+        print("   %6.0f%% %7.2f %7.2f %5d" % (
+            100.0 * stub['occupancy'], stub['queue_wait_p50'], stub['queue_wait_p95'], stub['max_in_flight'],
+        ))
+    else:
+        print()
+    errors = sorted({s['error'] for s in samples if s['error']})
+    for error in errors[:3]:
+        print("      erreur : %s" % error)
+
+
+url = os.environ.get('LOAD_VLLM_URL', 'http://127.0.0.1:8100').rstrip('/')
+model = os.environ.get('LOAD_VLLM_MODEL', 'stub-model')
+levels = [int(u) for u in os.environ.get('LOAD_USERS', '1,2,4,8').split(',') if u.strip()]
+iterations = int(os.environ.get('LOAD_ITERATIONS', '5'))
+scenario = os.environ.get('LOAD_SCENARIO', 'search')
+questions = DEFAULT_QUESTIONS
+if os.environ.get('LOAD_QUESTIONS'):
+    with open(os.environ['LOAD_QUESTIONS']) as f:
+        questions = json.load(f)
+
+print("Test de charge '%s' sur %s (%d requêtes par utilisateur)" % (scenario, url, iterations))
+print("%5s %6s %5s %8s %7s %7s %7s %7s   %7s %7s %7s %5s" % (
+    'users', 'req', 'err', 'req/s', 'p50', 'p95', 'p99', 'adm95',
+    'vllm', 'file50', 'file95', 'max',
+))
+for users in levels:
+    samples, elapsed, stub = run_level(env, users, iterations, scenario, questions, url, model)
+    report(users, samples, elapsed, stub)
+    if samples and all(s['error'] for s in samples):
+        print("\nARRÊT : toutes les requêtes du palier ont échoué, les mesures ne sont pas "
+              "significatives. Vérifiez LOAD_VLLM_URL (URL de base, sans /v1/chat/completions).")
+        break
+
+env.cr.rollback()
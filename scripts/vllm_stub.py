@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""Serveur VLLM factice (API compatible OpenAI) pour les tests de charge et l'évaluation.
+
+    python3 scripts/vllm_stub.py --port 8100 --service-time 0.8 --concurrency 4
+
+Le serveur simule un VLLM saturable : au plus --concurrency requêtes sont traitées
+simultanément, les autres attendent ; chaque requête occupe un créneau pendant un
+temps de service fixe ou tiré selon une loi exponentielle de moyenne --service-time.
+
+Les réponses sont déduites de la requête (guided_choice, prompt de domaine...) ou
+rejouées depuis un fichier de réponses enregistrées (--replay), indexé par
+request_key() : voir scripts/eval_models.py. Les requêtes absentes du fichier sont
+comptées (replay_misses dans /stats) et reçoivent une réponse déduite.
+
+Endpoints : POST /v1/chat/completions, GET /v1/models, POST /tokenize,
+GET /stats (métriques JSON), POST /stats/reset.
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+_DATE_RE = re.compile(r"\b\d{4}-\d{2}-\d{2}\b")
+
+
+def request_key(payload):
+    """Clé d'une requête de chat, pour rejouer une réponse enregistrée.
+
+    Seuls les messages comptent, dates masquées : la clé ne dépend ni du modèle servi
+    par la cible ni du jour où les réponses ont été enregistrées.
+    """
+    data = json.dumps(payload.get('messages'), sort_keys=True, ensure_ascii=False)
+    data = _DATE_RE.sub('<date>', ' '.join(data.split()))
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+def percentile(values, pct):
+    """Percentile (interpolation au rang le plus proche) d'une liste de valeurs."""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(pct / 100.0 * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+class StubState:
+    """Créneaux de traitement et métriques du serveur factice."""
+
+    def __init__(self, concurrency, service_time, distribution, model, replay=None):
+        self.concurrency = concurrency
+        self.service_time = service_time
+        self.distribution = distribution
+        self.model = model
+        self.replay = replay or {}
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started = time.time()
+            self.busy_time = 0.0
+            self.queue_waits = []
+            self.service_times = []
+            self.in_flight = 0
+            self.max_in_flight = 0
+            self.replay_hits = 0
+            self.replay_misses = 0
+
+    def draw_service_time(self):
+        if self.distribution == 'exp' and self.service_time > 0:
+            return random.expovariate(1.0 / self.service_time)
+        return self.service_time
+
+    def process(self):
+        """Attend un créneau libre puis simule le temps de service."""
+        arrived = time.time()
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        with self.slots:
+            waited = time.time() - arrived
+            service = self.draw_service_time()
+            time.sleep(service)
+        with self.lock:
+            self.in_flight -= 1
+            self.busy_time += service
+            self.queue_waits.append(waited)
+            self.service_times.append(service)
+
+    def stats(self):
+        with self.lock:
+            elapsed = max(time.time() - self.started, 1e-6)
+            return {
+                'requests':        len(self.service_times),
+                'elapsed':         elapsed,
+                'throughput':      len(self.service_times) / elapsed,
+                'occupancy':       self.busy_time / (elapsed * self.concurrency),
+                'max_in_flight':   self.max_in_flight,
+                'queue_wait_p50':  percentile(self.queue_waits, 50),
+                'queue_wait_p95':  percentile(self.queue_waits, 95),
+                'queue_wait_p99':  percentile(self.queue_waits, 99),
+                'service_time_avg': sum(self.service_times) / len(self.service_times) if self.service_times else 0.0,
+                'replay_hits':     self.replay_hits,
+                'replay_misses':   self.replay_misses,
+            }
+
+    def lookup(self, key):
+        """Réponses enregistrées pour une clé (None si absente), en comptant les échecs."""
+        if not self.replay:
+            return None
+        contents = self.replay.get(key)
+        with self.lock:
+            if contents is None:
+                self.replay_misses += 1
+            else:
+                self.replay_hits += 1
+        return contents
+
+
+def guess_content(payload):
+    """Réponse plausible pour une requête de la recherche générale ou du chat."""
+    choices = payload.get('guided_choice')
+    if choices:
+        for preferred in ('res.partner', 'tree', 'none'):
+            if preferred in choices:
+                return preferred
+        return choices[0]
+    system = ''
+    for message in payload.get('messages', []):
+        if message.get('role') == 'system':
+            system = message.get('content') or ''
+    if 'domaine' in system.lower():
+        return "```python\n[('id', '!=', False)]\n```"
+    return "Réponse du serveur VLLM factice."
+
+
+def make_handler(state):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def _read_json(self):
+            if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+                body = b''
+                while True:
+                    size = int(self.rfile.readline().strip() or b'0', 16)
+                    if not size:
+                        self.rfile.readline()
+                        break
+                    body += self.rfile.read(size)
+                    self.rfile.readline()
+            else:
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            return json.loads(body or b'{}')
+
+        def _send_json(self, data, status=200):
+            body = json.dumps(data).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip('/') == '/v1/models':
+                self._send_json({'object': 'list', 'data': [
+                    {'id': state.model, 'object': 'model', 'max_model_len': 32768},
+                ]})
+            elif self.path.rstrip('/') == '/stats':
+                self._send_json(state.stats())
+            else:
+                self._send_json({'error': 'not found'}, status=404)
+
+        def do_POST(self):
+            path = self.path.rstrip('/')
+            payload = self._read_json()
+            if path == '/stats/reset':
+                state.reset()
+                self._send_json({'ok': True})
+            elif path == '/tokenize':
+                self._send_json({'count': len(payload.get('prompt') or '') // 4})
+            elif path == '/v1/chat/completions':
+                state.process()
+                key = request_key(payload)
+                contents = state.lookup(key)
+                if contents is None:
+                    contents = [guess_content(payload)] * max(payload.get('n') or 1, 1)
+                elif isinstance(contents, str):
+                    contents = [contents]
+                prompt_tokens = len(json.dumps(payload.get('messages'))) // 4
+                completion_tokens = sum(len(c) // 4 + 1 for c in contents)
+                self._send_json({
+                    'id': 'stub-%s' % key[:12],
+                    'object': 'chat.completion',
+                    'model': payload.get('model'),
+                    'choices': [
+                        {'index': i, 'message': {'role': 'assistant', 'content': c}, 'finish_reason': 'stop'}
+                        for i, c in enumerate(contents)
+                    ],
+                    'usage': {
+                        'prompt_tokens': prompt_tokens,
+                        'completion_tokens': completion_tokens,
+                        'total_tokens': prompt_tokens + completion_tokens,
+                    },
+                })
+            else:
+                self._send_json({'error': 'not found'}, status=404)
+
+    return Handler
+
+
+def serve(host='127.0.0.1', port=8100, concurrency=4, service_time=0.5, distribution='fixed',
+          model='stub-model', replay=None):
+    """Démarre le serveur factice dans un thread et le retourne (server.shutdown() pour l'arrêter)."""
+    state = StubState(concurrency, service_time, distribution, model, replay=replay)
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    server.state = state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--concurrency', type=int, default=4, help="Requêtes traitées simultanément")
+    parser.add_argument('--service-time', type=float, default=0.5, help="Temps de service moyen (s)")
+    parser.add_argument('--distribution', choices=('fixed', 'exp'), default='fixed')
+    parser.add_argument('--model', default='stub-model', help="Nom du modèle servi")
+    parser.add_argument('--replay', help="Fichier JSON de réponses enregistrées {clé: contenu}")
+    args = parser.parse_args()
+    replay = None
+    if args.replay:
+        with open(args.replay) as f:
+            replay = json.load(f)
+    server = serve(args.host, args.port, args.concurrency, args.service_time, args.distribution,
+                   args.model, replay=replay)
+    print("Serveur VLLM factice sur http://%s:%s (modèle %s)" % (args.host, args.port, args.model))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
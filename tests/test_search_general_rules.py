@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+import datetime as dt
+from types import SimpleNamespace
+
+from odoo.tests.common import BaseCase
+
+from odoo.addons.is_vllm2odoo.models.is_search_general_rules import (
+    DATE_FIELDS, MODEL_RULES, parse_question,
+)
+
+
+def _fixed_datetime(today):
+    """Module datetime dont la date du jour est figée, pour évaluer les bornes générées."""
+
+    class FixedDate(dt.date):
+        @classmethod
+        def today(cls):
+            return cls(today.year, today.month, today.day)
+
+    return SimpleNamespace(date=FixedDate, datetime=dt.datetime, timedelta=dt.timedelta)
+
+
+class TestSearchGeneralRules(BaseCase):
+
+    def period(self, question, today):
+        parsed = parse_question(question)
+        self.assertTrue(parsed and parsed['period'], question)
+        context = {'datetime': _fixed_datetime(today)}
+        return tuple(eval(expr, context) if expr else None for expr in parsed['period'])
+
+    def test_month_boundaries(self):
+        self.assertEqual(self.period("factures de ce mois", dt.date(2024, 12, 31)),
+                         ('2024-12-01', '2025-01-01'))
+        self.assertEqual(self.period("factures du mois dernier", dt.date(2024, 1, 15)),
+                         ('2023-12-01', '2024-01-01'))
+        self.assertEqual(self.period("commandes du mois", dt.date(2024, 2, 29)),
+                         ('2024-02-01', '2024-03-01'))
+
+    def test_quarter_boundaries(self):
+        for today, expected in (
+            (dt.date(2024, 1, 1), ('2024-01-01', '2024-04-01')),
+            (dt.date(2024, 6, 30), ('2024-04-01', '2024-07-01')),
+            (dt.date(2024, 12, 31), ('2024-10-01', '2025-01-01')),
+        ):
+            self.assertEqual(self.period("factures de ce trimestre", today), expected)
+        for today, expected in (
+            (dt.date(2024, 2, 10), ('2023-10-01', '2024-01-01')),
+            (dt.date(2024, 10, 1), ('2024-07-01', '2024-10-01')),
+        ):
+            self.assertEqual(self.period("factures du trimestre dernier", today), expected)
+
+    def test_year_and_week(self):
+        self.assertEqual(self.period("commandes de l'année dernière", dt.date(2024, 1, 1)),
+                         ('2023-01-01', '2024-01-01'))
+        self.assertEqual(self.period("commandes depuis 2022", dt.date(2024, 5, 5)),
+                         ('2022-01-01', None))
+        # Le 2024-05-05 est un dimanche : la semaine commence le lundi 29 avril
+        self.assertEqual(self.period("livraisons de cette semaine", dt.date(2024, 5, 5)),
+                         ('2024-04-29', '2024-05-06'))
+
+    def test_unrecognised_words_rejected(self):
+        self.assertIsNone(parse_question("factures par client"))
+        self.assertIsNone(parse_question("graphique des ventes par mois"))
+        self.assertIsNone(parse_question("factures de ce mois de plus de 1000 euros"))
+        self.assertIsNone(parse_question(""))
+
+    def test_states(self):
+        parsed = parse_question("devis en brouillon")
+        self.assertEqual(parsed['model'], 'sale.order')
+        self.assertEqual(parsed['base'], [])
+        self.assertEqual(parsed['states'], [('state', ('draft',))])
+        parsed = parse_question("factures clients non payées")
+        self.assertEqual(parsed['base'], [('move_type', '=', 'out_invoice')])
+        self.assertEqual(parsed['states'], [('payment_state', ('not_paid', 'partial'))])
+
+    def test_state_replaces_document_filter(self):
+        parsed = parse_question("devis annulés")
+        self.assertEqual(parsed['base'], [])
+        self.assertEqual(parsed['states'], [('state', ('cancel',))])
+        self.assertEqual(parse_question("devis")['base'], [('state', 'in', ('draft', 'sent'))])
+
+    def test_conflicting_states_rejected(self):
+        self.assertIsNone(parse_question("commandes en brouillon annulées"))
+
+    def test_date_field_for_each_document_type(self):
+        for _pattern, model, _base in MODEL_RULES:
+            self.assertIn(model, DATE_FIELDS, model)
+        self.assertEqual(DATE_FIELDS['res.partner'], 'create_date')